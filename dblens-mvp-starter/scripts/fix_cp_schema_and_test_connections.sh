@@ -10,7 +10,7 @@ docker compose exec -T postgres psql -U postgres -d dblens -v ON_ERROR_STOP=1 <<
 CREATE TABLE IF NOT EXISTS public.connections (
   id                  bigserial PRIMARY KEY,
   name                text NOT NULL,
-  driver              text NOT NULL CHECK (driver IN ('postgres','mysql','snowflake')),
+  driver              text NOT NULL CHECK (driver <> ''),
   dsn                 text,
   secret_ref          text,
   read_only_verified  boolean DEFAULT false,
@@ -18,6 +18,12 @@ CREATE TABLE IF NOT EXISTS public.connections (
   created_at          timestamptz DEFAULT now(),
   last_tested_at      timestamptz
 );
+-- drivers come from the connector registry (built-ins and plugins); the API validates the name
+ALTER TABLE public.connections DROP CONSTRAINT IF EXISTS connections_driver_check;
+ALTER TABLE public.connections ADD CONSTRAINT connections_driver_check CHECK (driver <> '');
+-- read replicas (optional): JSON array of DSNs, plus the lag a replica may have and still serve reads
+ALTER TABLE public.connections ADD COLUMN IF NOT EXISTS replica_dsns jsonb;
+ALTER TABLE public.connections ADD COLUMN IF NOT EXISTS max_replica_lag_s double precision;
 
 -- schema card cache
 CREATE TABLE IF NOT EXISTS public.schema_card_cache (
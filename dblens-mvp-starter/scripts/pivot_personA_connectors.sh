@@ -25,7 +25,7 @@ docker compose exec -T postgres psql -U postgres -d dblens -v ON_ERROR_STOP=1 <<
 CREATE TABLE IF NOT EXISTS public.connections (
   id                bigserial PRIMARY KEY,
   name              text NOT NULL,
-  driver            text NOT NULL CHECK (driver IN ('postgres','mysql','snowflake')),
+  driver            text NOT NULL CHECK (driver <> ''),  -- any registered connector driver
   dsn               text,                     -- dev only; for prod use secret_ref
   secret_ref        text,                     -- e.g., aws-secrets-manager reference
   read_only_verified boolean DEFAULT false,
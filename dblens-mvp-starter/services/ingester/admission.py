@@ -0,0 +1,178 @@
+"""Admission control in front of external connections.
+
+Two gates, both per conn_id:
+
+- cost: before /approve runs a query, the connector's validate() estimate is
+  checked against max_total_cost (Postgres), max_est_rows (Postgres/MySQL
+  EXPLAIN rows) and max_bytes (Snowflake plan bytesAssigned). A limit of 0
+  disables that check; when no limit is set for an estimate the driver
+  produces (connector.estimates), the query is not planned at all.
+- concurrency: at most max_concurrency backend calls run at once; the rest
+  wait in FIFO order for up to queue_timeout_s. Waiting holds a worker
+  thread (the endpoints are sync), so at most max_queue requests wait per
+  conn_id and any more are turned away at once; one busy connection cannot
+  use up the thread pool every other connection (and /metrics) needs.
+
+Defaults come from the environment (VALIDATE_MAX_TOTAL_COST,
+VALIDATE_MAX_EST_ROWS, ADMISSION_MAX_BYTES, ADMISSION_MAX_CONCURRENCY,
+ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_S); ADMISSION_LIMITS takes a JSON object of per-conn_id
+overrides, e.g. {"3": {"max_total_cost": 5e6, "max_concurrency": 2}}.
+"""
+from __future__ import annotations
+import os, json, time, threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+import metrics
+import cancellation
+
+WAIT_SECONDS = metrics.Histogram("dblens_admission_wait_seconds", "Time spent queued for a connection slot", ("endpoint", "driver", "conn_id"))
+QUEUED = metrics.Gauge("dblens_admission_queued", "Requests waiting for a connection slot", ("driver", "conn_id"))
+SLOTS_IN_USE = metrics.Gauge("dblens_admission_slots_in_use", "Connection slots in use (pool utilization)", ("driver", "conn_id"))
+SLOTS_SIZE = metrics.Gauge("dblens_admission_slots", "Configured connection slots", ("driver", "conn_id"))
+REJECTED = metrics.Counter("dblens_admission_rejected_total", "Requests refused by admission control", ("endpoint", "driver", "conn_id", "reason"))
+
+def _env_num(name: str, default: float) -> float:
+    v = os.getenv(name)
+    return float(v) if v not in (None, "") else default
+
+DEFAULT_LIMITS = {
+    "max_total_cost": _env_num("VALIDATE_MAX_TOTAL_COST", 1_000_000),
+    "max_est_rows": _env_num("VALIDATE_MAX_EST_ROWS", 500_000),
+    "max_bytes": _env_num("ADMISSION_MAX_BYTES", 0),
+    "max_concurrency": int(_env_num("ADMISSION_MAX_CONCURRENCY", 4)),
+    "max_queue": int(_env_num("ADMISSION_MAX_QUEUE", 8)),
+    "queue_timeout_s": _env_num("ADMISSION_QUEUE_TIMEOUT_S", 30),
+}
+
+def _load_overrides() -> Dict[str, Dict[str, Any]]:
+    raw = os.getenv("ADMISSION_LIMITS")
+    if not raw:
+        return {}
+    return {str(k): v for k, v in json.loads(raw).items()}
+
+OVERRIDES = _load_overrides()
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, limit: float, estimate: float):
+        super().__init__(f"{reason}: estimate {estimate:g} exceeds limit {limit:g}")
+        self.reason = reason
+        self.limit = limit
+        self.estimate = estimate
+
+class QueueTimeout(Exception):
+    pass
+
+class QueueFull(QueueTimeout):
+    """Refused without waiting: the connection already has max_queue requests queued."""
+
+def limits_for(conn_id: Any) -> Dict[str, Any]:
+    lim = dict(DEFAULT_LIMITS)
+    lim.update(OVERRIDES.get(str(conn_id), {}))
+    return lim
+
+ESTIMATE_LIMITS = (("total_cost", "max_total_cost"), ("est_rows", "max_est_rows"), ("est_bytes", "max_bytes"))
+
+def cost_checks_enabled(conn_id: Any, estimates: Optional[Iterable[str]] = None) -> bool:
+    """Whether any limit applies to the estimate keys a driver returns (all keys when unknown)."""
+    lim = limits_for(conn_id)
+    keys = set(estimates) if estimates is not None else {k for k, _ in ESTIMATE_LIMITS}
+    return any(lim[lim_key] for key, lim_key in ESTIMATE_LIMITS if key in keys)
+
+def over_limit(conn_id: Any, estimate: Dict[str, Any]) -> Optional[AdmissionRejected]:
+    """The rejection check_cost() would raise for a validate() result, without raising or counting it."""
+    lim = limits_for(conn_id)
+    for key, lim_key in ESTIMATE_LIMITS:
+        val = estimate.get(key)
+        if lim[lim_key] and val is not None and float(val) > lim[lim_key]:
+            return AdmissionRejected(lim_key, lim[lim_key], float(val))
+    return None
+
+def check_cost(conn_id: Any, estimate: Dict[str, Any]) -> None:
+    """Raise AdmissionRejected if a validate() result is over any configured limit."""
+    rej = over_limit(conn_id, estimate)
+    if rej is not None:
+        REJECTED.inc(reason=rej.reason)
+        raise rej
+
+class FairSlots:
+    """Counting semaphore that grants slots strictly in arrival order."""
+
+    def __init__(self, size: int, max_waiting: Optional[int] = None):
+        self.size = size
+        self.max_waiting = max_waiting
+        self.used = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, timeout: Optional[float]) -> bool:
+        """True once a slot is held, False on timeout; QueueFull if max_waiting are already queued."""
+        with self._lock:
+            if self.used < self.size and not self._waiters:
+                self.used += 1
+                return True
+            if self.max_waiting is not None and len(self._waiters) >= self.max_waiting:
+                raise QueueFull(f"{len(self._waiters)} requests already queued for {self.size} slots")
+            ev = threading.Event()
+            self._waiters.append(ev)
+        if ev.wait(timeout):
+            return True
+        with self._lock:
+            if ev.is_set():
+                # granted between the timeout and taking the lock
+                return True
+            self._waiters.remove(ev)
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # hand the slot straight to the oldest waiter so nobody can barge in
+                self._waiters.popleft().set()
+            else:
+                self.used -= 1
+
+_slots: Dict[str, FairSlots] = {}
+_slots_lock = threading.Lock()
+
+def _slots_for(conn_id: Any, driver: str) -> FairSlots:
+    key = str(conn_id)
+    with _slots_lock:
+        s = _slots.get(key)
+        if s is None:
+            lim = limits_for(conn_id)
+            s = _slots[key] = FairSlots(max(1, int(lim["max_concurrency"])), max(0, int(lim["max_queue"])))
+            SLOTS_SIZE.set(s.size, driver=driver, conn_id=conn_id)
+        return s
+
+@contextmanager
+def slot(conn_id: Any, driver: str):
+    """Hold one of conn_id's concurrency slots; yields the queue wait in seconds."""
+    s = _slots_for(conn_id, driver)
+    # never queue past the request's own deadline
+    timeout = min(float(limits_for(conn_id)["queue_timeout_s"]), cancellation.timeout_s(float("inf")))
+    t0 = time.perf_counter()
+    QUEUED.inc(driver=driver, conn_id=conn_id)
+    try:
+        ok = s.acquire(timeout)
+    except QueueFull as e:
+        REJECTED.inc(reason="queue_full", driver=driver, conn_id=conn_id)
+        raise QueueFull(f"connection {conn_id} busy: {e}") from None
+    finally:
+        QUEUED.dec(driver=driver, conn_id=conn_id)
+    waited = time.perf_counter() - t0
+    WAIT_SECONDS.observe(waited, driver=driver, conn_id=conn_id)
+    if not ok:
+        REJECTED.inc(reason="queue_timeout", driver=driver, conn_id=conn_id)
+        raise QueueTimeout(f"connection {conn_id} busy: waited {waited:.1f}s for one of {s.size} slots")
+    SLOTS_IN_USE.inc(driver=driver, conn_id=conn_id)
+    try:
+        yield waited
+    finally:
+        SLOTS_IN_USE.dec(driver=driver, conn_id=conn_id)
+        s.release()
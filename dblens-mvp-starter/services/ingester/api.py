@@ -1,63 +1,143 @@
-import json
-
-# --- JSON default encoder for datetimes/decimals/others ---
-def _jd(obj):
-    try:
-        import datetime, decimal
-        if isinstance(obj, (datetime.datetime, datetime.date)):
-            return obj.isoformat()
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-    except Exception:
-        pass
-    return str(obj)
-# ----------------------------------------------------------
-
-from fastapi import FastAPI, HTTPException, Body, Query
+from fastapi import FastAPI, HTTPException, Body, Query, Request
+from fastapi.responses import Response
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
+from starlette.routing import Match
 from typing import Optional, Dict, Any, List
-import os, json, hashlib, time
+from contextlib import contextmanager
+import os, json, hashlib, time, fnmatch
 import psycopg
 from psycopg.rows import dict_row
+import metrics
+import serialize
+import cursors
+import admission
+import cancellation
+import schema_search
+import results
 
 # control-plane DSNs (same as before)
 APP_RO_DSN   = os.getenv("APP_RO_DSN")
 LOADER_RW_DSN= os.getenv("LOADER_RW_DSN")
+# responses smaller than this go out uncompressed
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+VALIDATE_BATCH_MAX = int(os.getenv("VALIDATE_BATCH_MAX", "50"))
 
-# Connectors
+# Connectors (driver modules are imported on first use, see connectors/registry.py)
 from connectors.connector_base import single_statement_select_only
-from connectors.postgres_external import PostgresExternal
-from connectors.mysql import MySQLConnector
-from connectors.snowflake import SnowflakeConnector
+from connectors import registry as connector_registry
+from connectors import routing
 
 def get_cp_conn(write=False):
     dsn = LOADER_RW_DSN if write else APP_RO_DSN
     return psycopg.connect(dsn, autocommit=True)
 
 def load_connection(conn_id:int)->Dict[str,Any]:
-    with get_cp_conn(False) as cp, cp.cursor(row_factory=dict_row) as cur:
+    metrics.bind(conn_id=conn_id)
+    with metrics.stage("load_connection"), get_cp_conn(False) as cp, cp.cursor(row_factory=dict_row) as cur:
         cur.execute("SELECT * FROM connections WHERE id=%s",(conn_id,))
         row = cur.fetchone()
         if not row:
             raise HTTPException(404, f"connection {conn_id} not found")
-        return row
+    # every stage timed after this point is attributed to this driver/conn_id
+    metrics.bind(driver=row["driver"])
+    return row
 
 def build_connector(rec:Dict[str,Any]):
-    driver = rec["driver"]
-    dsn = rec["dsn"]
-    if driver=="postgres": return PostgresExternal(dsn)
-    if driver=="mysql":    return MySQLConnector(dsn)
-    if driver=="snowflake":return SnowflakeConnector(dsn)
-    raise HTTPException(400, f"unsupported driver: {driver}")
+    try:
+        return routing.build(rec)
+    except (connector_registry.UnknownDriver, connector_registry.DriverUnavailable) as e:
+        raise HTTPException(400, str(e))
 
 app = FastAPI(title="DBLens MVP – Plug & Play")
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+# wraps GZip and the routes, so everything a request runs sees its deadline;
+# _observe below is registered later and therefore sits outside it
+app.add_middleware(cancellation.DeadlineMiddleware)
+
+def _route_path(request: Request) -> str:
+    # label by route template, not raw path, to keep series cardinality bounded
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def _observe(request: Request, call_next):
+    endpoint = _route_path(request)
+    token = metrics.bind(endpoint=endpoint, driver="local", conn_id="")
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        resp = await call_next(request)
+        status = resp.status_code
+        return resp
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, method=request.method)
+        metrics.REQUESTS.inc(method=request.method, status=status)
+        metrics.reset(token)
+
+def _respond(payload: Dict[str, Any], status_code: int = 200, adm: Optional["_Admitted"] = None,
+             headers: Optional[Dict[str, str]] = None) -> Response:
+    # encode inside the handler (bypassing jsonable_encoder) so serialization
+    # is a single native pass and shows up as its own stage
+    with metrics.stage("encode"):
+        resp = Response(serialize.dumps(payload), status_code=status_code, media_type="application/json", headers=headers)
+    if adm is not None:
+        resp.headers["X-Queue-Wait-Ms"] = f"{adm.wait_s * 1000:.1f}"
+    return resp
+
+class _Admitted:
+    def __init__(self, wait_s: float, estimate: Optional[Dict[str, Any]]):
+        self.wait_s = wait_s
+        self.estimate = estimate
+
+@contextmanager
+def _admitted(rec: Optional[Dict[str, Any]], conn=None, sql: Optional[str] = None, limit: Optional[int] = None, plan=None):
+    """Hold a concurrency slot for rec's connection; with `sql`, also gate on its plan estimate.
+
+    The estimate is for the statement that will actually run, i.e. `sql` under `limit`,
+    from `plan(stmt)` when given, else conn.estimate(). A statement the planner refuses is a 400.
+    """
+    key = rec["id"] if rec else "local"
+    driver = rec["driver"] if rec else "local"
+    try:
+        with admission.slot(key, driver) as waited, metrics.INFLIGHT.track():
+            est = None
+            if sql is not None and conn is not None and admission.cost_checks_enabled(key, getattr(conn, "estimates", None)):
+                stmt = conn.limited_sql(sql, limit) if hasattr(conn, "limited_sql") else sql
+                plan = plan or getattr(conn, "estimate", conn.validate)
+                with metrics.stage("admission"):
+                    try:
+                        est = plan(stmt)
+                    except ValueError as e:
+                        raise HTTPException(400, str(e))
+                admission.check_cost(key, est)
+            yield _Admitted(waited, est)
+    except admission.QueueTimeout as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": "5"})
+    except admission.AdmissionRejected as e:
+        raise HTTPException(422, {"reason": e.reason, "limit": e.limit, "estimate": e.estimate, "message": str(e)})
+
+@app.exception_handler(cancellation.Cancelled)
+async def _cancelled(request: Request, exc: cancellation.Cancelled):
+    # 499 is nginx's "client closed request"; nobody reads it, but it keeps logs/metrics honest
+    status = 504 if exc.reason == "deadline" else 499
+    return Response(serialize.dumps({"detail": str(exc), "reason": exc.reason}), status_code=status, media_type="application/json")
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # -------------------- Models --------------------
 class NewConnection(BaseModel):
     name: str
-    driver: str  # postgres | mysql | snowflake
+    driver: str  # postgres | mysql | snowflake | any registered plugin driver
     dsn: Optional[str] = None
     secret_ref: Optional[str] = None
+    replica_dsns: Optional[List[str]] = None  # read replicas of dsn; reads are routed across all of them
+    max_replica_lag_s: Optional[float] = None  # skip replicas further behind than this
 
 class FromURL(BaseModel):
     url: str
@@ -70,26 +150,57 @@ class SQLBody(BaseModel):
     conn_id: Optional[int] = None
     limit: Optional[int] = None
     question: Optional[str] = None
+    layout: Optional[str] = "rows"  # rows | columns (column arrays, smaller payloads)
+    page_size: Optional[int] = None  # /approve: return one page + a cursor token
+
+class BatchBody(BaseModel):
+    sqls: List[str]
+    conn_id: Optional[int] = None
+
+class PageBody(BaseModel):
+    cursor: str
+    page_size: Optional[int] = None
+    layout: Optional[str] = "rows"
 
 # -------------------- Connections --------------------
 @app.post("/connections")
 def add_connection(body: NewConnection):
-    if body.driver not in ("postgres","mysql","snowflake"):
-        raise HTTPException(400, "driver must be one of postgres|mysql|snowflake")
+    if body.driver not in connector_registry.drivers():
+        raise HTTPException(400, f"driver must be one of {'|'.join(connector_registry.drivers())}")
+    cols = ["name", "driver", "dsn", "secret_ref", "features_json"]
+    vals: List[Any] = [body.name, body.driver, body.dsn, body.secret_ref, json.dumps({})]
+    # replica columns only when used, so control planes that predate them keep working
+    if body.replica_dsns:
+        cols.append("replica_dsns"); vals.append(json.dumps(body.replica_dsns))
+    if body.max_replica_lag_s is not None:
+        cols.append("max_replica_lag_s"); vals.append(body.max_replica_lag_s)
     with get_cp_conn(True) as cp, cp.cursor(row_factory=dict_row) as cur:
-        cur.execute("""
-            INSERT INTO connections(name,driver,dsn,secret_ref,features_json,read_only_verified,created_at,last_tested_at)
-            VALUES(%s,%s,%s,%s,%s,false,now(),NULL)
-            RETURNING id
-        """,(body.name, body.driver, body.dsn, body.secret_ref, json.dumps({})))
+        try:
+            cur.execute(f"""
+                INSERT INTO connections({",".join(cols)},read_only_verified,created_at,last_tested_at)
+                VALUES({",".join(["%s"] * len(vals))},false,now(),NULL)
+                RETURNING id
+            """, vals)
+        except psycopg.errors.UndefinedColumn as e:
+            raise HTTPException(400, f"this control plane has no replica columns yet "
+                                     f"(run scripts/fix_cp_schema_and_test_connections.sh): {e}")
+        except psycopg.errors.CheckViolation as e:
+            # control plane still has the old built-ins-only CHECK on connections.driver
+            raise HTTPException(400, f"driver {body.driver!r} is not allowed by the connections table "
+                                     f"(run scripts/fix_cp_schema_and_test_connections.sh to allow plugin drivers): {e}")
         cid = cur.fetchone()["id"]
-        return {"ok": True, "id": cid}
+        return _respond({"ok": True, "id": cid})
 
 @app.get("/connections")
 def list_connections():
     with get_cp_conn(False) as cp, cp.cursor(row_factory=dict_row) as cur:
-        cur.execute("SELECT id,name,driver,read_only_verified,features_json,created_at,last_tested_at FROM connections ORDER BY id")
-        return {"connections": cur.fetchall()}
+        # replica columns read through to_jsonb() so this works before they are migrated in
+        cur.execute("""SELECT id,name,driver,read_only_verified,features_json,created_at,last_tested_at,
+                              CASE WHEN jsonb_typeof(to_jsonb(c)->'replica_dsns') = 'array'
+                                   THEN jsonb_array_length(to_jsonb(c)->'replica_dsns') ELSE 0 END AS replicas,
+                              (to_jsonb(c)->>'max_replica_lag_s')::double precision AS max_replica_lag_s
+                       FROM connections c ORDER BY id""")
+        return _respond({"connections": cur.fetchall()})
 
 @app.post("/connections/test")
 def test_connection(conn_id: int = Body(..., embed=True)):
@@ -106,128 +217,468 @@ def test_connection(conn_id: int = Body(..., embed=True)):
             ro_ok = True
         with get_cp_conn(True) as cp, cp.cursor() as cur:
             cur.execute("UPDATE connections SET features_json=%s, read_only_verified=%s, last_tested_at=now() WHERE id=%s",
-                        (json.dumps(res), ro_ok, conn_id))
-        return {"ok": True, "features": res, "read_only_verified": ro_ok}
+                        (serialize.dumps_str(res), ro_ok, conn_id))
+        return _respond({"ok": True, "features": res, "read_only_verified": ro_ok})
     except Exception as e:
         raise HTTPException(400, f"test failed: {e}")
 
 # -------------------- Schema Cards --------------------
-@app.get("/schema/cards")
-def schema_cards(conn_id: Optional[int] = Query(None)):
-    if conn_id:
-        rec = load_connection(conn_id)
-        conn = build_connector(rec)
+CARD_INCLUDES = ("names", "columns", "samples")
+
+def _etag(*parts: Any) -> str:
+    # weak: the gzip middleware may re-encode the body, the content is what we vouch for
+    return 'W/"%s"' % hashlib.sha1(serialize.dumps(list(parts))).hexdigest()[:24]
+
+def _not_modified(request: Request, etag: str, cache: str) -> Optional[Response]:
+    inm = request.headers.get("if-none-match")
+    tags = {t.strip().removeprefix("W/") for t in inm.split(",")} if inm else set()
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        metrics.CACHE.inc(cache=cache, result="not_modified")
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def _glob_like(pattern: Optional[str]) -> str:
+    """Shell-style pattern (* and ?) -> ILIKE pattern; None matches everything."""
+    if not pattern:
+        return "%"
+    esc = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return esc.replace("*", "%").replace("?", "_")
+
+def _glob_match(pattern: Optional[str], value: str) -> bool:
+    return not pattern or fnmatch.fnmatchcase(value.lower(), pattern.lower())
+
+def _project(t: Dict[str, Any], include: str) -> Dict[str, Any]:
+    if include == "names":
+        return {"schema": t.get("schema"), "name": t.get("name")}
+    if include == "columns":
+        return {k: v for k, v in t.items() if k != "samples"}
+    return t
+
+def _page_info(total: int, offset: int, limit: Optional[int], returned: int) -> Dict[str, Any]:
+    nxt = offset + returned
+    return {"offset": offset, "limit": limit, "total": total, "next_offset": nxt if nxt < total else None}
+
+def _refresh_cards(rec: Dict[str, Any], conn_id: int) -> Dict[str, Any]:
+    """Introspect the source and mirror it into schema_card_cache.
+
+    Rows are only rewritten (and refreshed_at only moves) when a table's columns
+    or samples changed, and tables gone from the source are dropped, so the
+    cache fingerprint -- and with it the ETag -- is stable across no-op refreshes.
+    """
+    conn = build_connector(rec)
+    with _admitted(rec), metrics.stage("introspect"):
         card = conn.introspect_schema(limit_samples=5)
-        # cache (best-effort)
-        with get_cp_conn(True) as cp, cp.cursor() as cur:
-            for t in card.get("tables",[]):
-                fqn = f'{t.get("schema","")}.{t.get("name","")}'
-                cur.execute("""
-                  INSERT INTO schema_card_cache(conn_id, table_fqn, columns_json, samples_json, refreshed_at)
-                  VALUES (%s,%s,%s,%s,now())
-                  ON CONFLICT(conn_id, table_fqn) DO UPDATE
-                  SET columns_json=EXCLUDED.columns_json, samples_json=EXCLUDED.samples_json, refreshed_at=now()
-                """,(conn_id, fqn, json.dumps(t.get("columns", []), default=_jd), json.dumps(t.get("samples", {}), default=_jd)))
-        return {"SchemaCard": card}
-    # fallback: existing local view (for backward compat)
-    with get_cp_conn(False) as cp, cp.cursor(row_factory=dict_row) as cur:
+    metrics.CACHE.inc(cache="schema_cards", result="miss")
+    tables = card.get("tables", [])
+    fqns = [f'{t.get("schema","")}.{t.get("name","")}' for t in tables]
+    # cache (best-effort)
+    with metrics.stage("cache_write"), get_cp_conn(True) as cp, cp.cursor() as cur:
+        for fqn, t in zip(fqns, tables):
+            cur.execute("""
+              INSERT INTO schema_card_cache(conn_id, table_fqn, columns_json, samples_json, refreshed_at)
+              VALUES (%s,%s,%s,%s,now())
+              ON CONFLICT(conn_id, table_fqn) DO UPDATE
+              SET columns_json=EXCLUDED.columns_json, samples_json=EXCLUDED.samples_json, refreshed_at=now()
+              WHERE schema_card_cache.columns_json IS DISTINCT FROM EXCLUDED.columns_json
+                 OR schema_card_cache.samples_json IS DISTINCT FROM EXCLUDED.samples_json
+            """,(conn_id, fqn, serialize.dumps_str(t.get("columns", [])), serialize.dumps_str(t.get("samples", {}))))
+        cur.execute("DELETE FROM schema_card_cache WHERE conn_id=%s AND NOT (table_fqn = ANY(%s))", (conn_id, fqns))
+        cur.execute("SELECT table_fqn, refreshed_at FROM schema_card_cache WHERE conn_id=%s", (conn_id,))
+        stamps = dict(cur.fetchall())
+    schema_search.INDEXES.upsert_card(conn_id, card, stamps)
+    return card
+
+def _cache_fingerprint(conn_id: int):
+    with get_cp_conn(False) as cp, cp.cursor() as cur:
+        cur.execute("SELECT count(*), max(refreshed_at) FROM schema_card_cache WHERE conn_id=%s", (conn_id,))
+        return cur.fetchone()
+
+def _cached_cards(conn_id: int, schema: Optional[str], table: Optional[str], include: str,
+                  limit: Optional[int], offset: int):
+    samples_col = "samples_json" if include == "samples" else "NULL"
+    cols_col = "NULL" if include == "names" else "columns_json"
+    with metrics.stage("cache_read"), get_cp_conn(False) as cp, cp.cursor() as cur:
+        cur.execute(f"""
+            SELECT table_fqn, {cols_col}, {samples_col}, count(*) OVER ()
+            FROM schema_card_cache
+            WHERE conn_id=%s
+              AND split_part(table_fqn, '.', 1) ILIKE %s
+              AND substr(table_fqn, strpos(table_fqn, '.') + 1) ILIKE %s
+            ORDER BY table_fqn
+            LIMIT %s OFFSET %s
+        """, (conn_id, _glob_like(schema), _glob_like(table), limit, offset))
+        rows = cur.fetchall()
+    tables = []
+    for fqn, cols, samples, _ in rows:
+        sch, _, name = fqn.partition(".")
+        t = {"schema": sch, "name": name}
+        if include != "names":
+            t["columns"] = cols or []
+        if include == "samples":
+            t["samples"] = samples or {}
+        tables.append(t)
+    total = rows[0][3] if rows else 0
+    if not rows and offset:
+        # past the end: the window function saw no rows, count separately
+        total = _cached_count(conn_id, schema, table)
+    return tables, total
+
+def _cached_count(conn_id: int, schema: Optional[str], table: Optional[str]) -> int:
+    with get_cp_conn(False) as cp, cp.cursor() as cur:
         cur.execute("""
-            SELECT table_schema as schema, table_name as name
-            FROM information_schema.tables
-            WHERE table_type='BASE TABLE' AND table_schema NOT IN ('pg_catalog','information_schema')
-            ORDER BY 1,2
-        """)
-        tables=[]
-        for r in cur.fetchall():
+            SELECT count(*) FROM schema_card_cache
+            WHERE conn_id=%s AND split_part(table_fqn, '.', 1) ILIKE %s
+              AND substr(table_fqn, strpos(table_fqn, '.') + 1) ILIKE %s
+        """, (conn_id, _glob_like(schema), _glob_like(table)))
+        return cur.fetchone()[0]
+
+def _local_cards(schema: Optional[str], table: Optional[str], include: str,
+                 limit: Optional[int], offset: int):
+    """Cards for the control-plane database itself: one catalog query, samples only for the page."""
+    with get_cp_conn(False) as cp, cp.cursor(row_factory=dict_row) as cur:
+        with metrics.stage("introspect"):
             cur.execute("""
-              SELECT column_name as name, data_type as type
-              FROM information_schema.columns
-              WHERE table_schema=%s AND table_name=%s
-              ORDER BY ordinal_position
-            """,(r["schema"], r["name"]))
-            cols = cur.fetchall()
-            cur.execute(f'SELECT * FROM "{r["schema"]}"."{r["name"]}" LIMIT 5')
-            rows = cur.fetchall()
-            samples={}
-            if rows:
-                keys = rows[0].keys()
-                for k in keys:
-                    samples[k]=[x[k] for x in rows]
-            tables.append({"schema":r["schema"], "name":r["name"], "columns":cols, "samples":samples})
-        return {"SchemaCard":{"tables":tables}}
+                SELECT t.table_schema AS schema, t.table_name AS name, c.column_name, c.data_type
+                FROM information_schema.tables t
+                LEFT JOIN information_schema.columns c
+                  ON c.table_schema = t.table_schema AND c.table_name = t.table_name
+                WHERE t.table_type='BASE TABLE' AND t.table_schema NOT IN ('pg_catalog','information_schema')
+                  AND t.table_schema ILIKE %s AND t.table_name ILIKE %s
+                ORDER BY 1, 2, c.ordinal_position
+            """, (_glob_like(schema), _glob_like(table)))
+            tables: List[Dict[str, Any]] = []
+            for r in cur.fetchall():
+                if not tables or (tables[-1]["schema"], tables[-1]["name"]) != (r["schema"], r["name"]):
+                    tables.append({"schema": r["schema"], "name": r["name"], "columns": []})
+                if r["column_name"] is not None:
+                    tables[-1]["columns"].append({"name": r["column_name"], "type": r["data_type"]})
+        total = len(tables)
+        page = tables[offset: offset + limit if limit else None]
+        if include == "samples":
+            with metrics.stage("samples"):
+                for t in page:
+                    cur.execute(f'SELECT * FROM "{t["schema"]}"."{t["name"]}" LIMIT 5')
+                    rows = cur.fetchall()
+                    t["samples"] = {k: [x[k] for x in rows] for k in rows[0].keys()} if rows else {}
+    return [_project(t, include) for t in page], total
+
+@app.get("/schema/cards")
+def schema_cards(request: Request, conn_id: Optional[int] = Query(None),
+                 schema: Optional[str] = Query(None, description="schema name pattern (* and ? wildcards)"),
+                 table: Optional[str] = Query(None, description="table name pattern (* and ? wildcards)"),
+                 include: str = Query("samples", description="names | columns | samples"),
+                 limit: Optional[int] = Query(None, ge=1, le=10000), offset: int = Query(0, ge=0),
+                 refresh: bool = Query(False, description="re-introspect the source; by default schema_card_cache is served "
+                                                          "(introspecting only while it is empty), so conditional GETs stay cheap")):
+    if include not in CARD_INCLUDES:
+        raise HTTPException(400, f"include must be one of {'|'.join(CARD_INCLUDES)}")
+    if conn_id:
+        rec = load_connection(conn_id)
+        card = None
+        if refresh:
+            card = _refresh_cards(rec, conn_id)
+        n, latest = _cache_fingerprint(conn_id)
+        if not n and card is None:
+            # nothing cached yet: a cache-only request still has to introspect once
+            card = _refresh_cards(rec, conn_id)
+            n, latest = _cache_fingerprint(conn_id)
+        etag = _etag(conn_id, n, latest, schema, table, include, limit, offset)
+        nm = _not_modified(request, etag, "schema_cards")
+        if nm is not None:
+            return nm
+        if card is not None:
+            # same order as the cache path so offsets mean the same thing either way
+            matched = sorted((t for t in card.get("tables", [])
+                              if _glob_match(schema, t.get("schema", "")) and _glob_match(table, t.get("name", ""))),
+                             key=lambda t: f'{t.get("schema","")}.{t.get("name","")}')
+            page = matched[offset: offset + limit if limit else None]
+            tables, total = [_project(t, include) for t in page], len(matched)
+        else:
+            metrics.CACHE.inc(cache="schema_cards", result="hit")
+            tables, total = _cached_cards(conn_id, schema, table, include, limit, offset)
+        return _respond({"SchemaCard": {"tables": tables}, "page": _page_info(total, offset, limit, len(tables))},
+                        headers={"ETag": etag})
+    # fallback: existing local view (for backward compat); no cheap fingerprint, so hash the payload
+    tables, total = _local_cards(schema, table, include, limit, offset)
+    payload = {"SchemaCard": {"tables": tables}, "page": _page_info(total, offset, limit, len(tables))}
+    etag = _etag(payload)
+    nm = _not_modified(request, etag, "schema_cards_local")
+    if nm is not None:
+        return nm
+    return _respond(payload, headers={"ETag": etag})
+
+@app.get("/schema/search")
+def schema_search_endpoint(conn_id: int = Query(...), q: str = Query(..., min_length=1), k: int = Query(10, ge=1, le=100)):
+    """Rank cached tables for a natural-language question (reads schema_card_cache only)."""
+    load_connection(conn_id)
+    t0 = time.perf_counter()
+    with metrics.stage("index_sync"), get_cp_conn(False) as cp:
+        idx = schema_search.INDEXES.sync(conn_id, cp)
+    with metrics.stage("search"):
+        hits = idx.search(q, k)
+    return _respond({"results": hits, "tables_indexed": len(idx),
+                     "took_ms": round((time.perf_counter() - t0) * 1000, 2)})
 
 # -------------------- Preview / Validate / Approve --------------------
+def _layout(body: SQLBody) -> str:
+    layout = body.layout or "rows"
+    if layout not in serialize.LAYOUTS:
+        raise HTTPException(400, f"layout must be one of {'|'.join(serialize.LAYOUTS)}")
+    return layout
+
 @app.post("/preview")
 def preview(body: SQLBody):
+    layout = _layout(body)
     if body.conn_id:
         rec = load_connection(body.conn_id)
         conn = build_connector(rec)
-        rows = conn.preview(body.sql, limit=body.limit or 20)
-        return {"rows": rows}
+        with _admitted(rec) as adm:
+            if layout == "columns":
+                # connector.preview() returns bare rows; column arrays need the names too
+                cols, rows = conn.execute_readonly(body.sql, limit=body.limit or 20)
+            else:
+                cols, rows = None, conn.preview(body.sql, limit=body.limit or 20)
+        metrics.RESULT_ROWS.inc(len(rows))
+        return _respond(serialize.result_payload(cols, rows, layout) if layout == "columns" else {"rows": rows}, adm=adm)
     # fallback to local
-    with get_cp_conn(False) as c, c.cursor() as cur:
-        cur.execute(f"WITH cte AS ({body.sql}) SELECT * FROM cte LIMIT %s",(body.limit or 20,))
-        return {"rows": cur.fetchall()}
+    with _admitted(None) as adm, get_cp_conn(False) as c, cancellation.guard(c.cancel), c.cursor() as cur:
+        with metrics.stage("execute"):
+            cur.execute(f"WITH cte AS ({body.sql}) SELECT * FROM cte LIMIT %s",(body.limit or 20,))
+        cols = [d[0] for d in cur.description] if cur.description else []
+        with metrics.stage("fetch"):
+            rows = cur.fetchall()
+    metrics.RESULT_ROWS.inc(len(rows))
+    return _respond(serialize.result_payload(cols, rows, layout) if layout == "columns" else {"rows": rows}, adm=adm)
 
 @app.post("/validate")
 def validate(body: SQLBody):
     if body.conn_id:
         rec = load_connection(body.conn_id)
         conn = build_connector(rec)
-        v = conn.validate(body.sql)
+        with _admitted(rec) as adm:
+            v = conn.validate(body.sql)
         # normalize fields
         out = {"explain": v}
         if "total_cost" in v: out["total_cost"]=v["total_cost"]
         if "est_rows" in v: out["est_rows"]=v["est_rows"]
         if "plan_text" in v: out["plan_text"]=v["plan_text"]
-        return out
+        if "est_bytes" in v: out["est_bytes"]=v["est_bytes"]
+        return _respond(out, adm=adm)
     # fallback to local
-    with get_cp_conn(False) as c, c.cursor(row_factory=dict_row) as cur:
-        cur.execute(f"EXPLAIN (FORMAT JSON) {body.sql}")
-        plan = cur.fetchone()["QUERY PLAN"]
-        node = plan[0]["Plan"]
-        return {"explain_json": plan, "total_cost": node.get("Total Cost"), "est_rows": node.get("Plan Rows")}
+    with _admitted(None) as adm:
+        return _respond(_explain_local(body.sql), adm=adm)
+
+def _explain_local(sql_text: str) -> Dict[str, Any]:
+    """Bare EXPLAIN on the control-plane database; like running there, no SELECT-only gate."""
+    with get_cp_conn(False) as c, cancellation.guard(c.cancel), c.cursor(row_factory=dict_row) as cur:
+        with metrics.stage("execute"):
+            cur.execute(f"EXPLAIN (FORMAT JSON) {sql_text}")
+            plan = cur.fetchone()["QUERY PLAN"]
+    node = plan[0]["Plan"]
+    return {"explain_json": plan, "total_cost": node.get("Total Cost"), "est_rows": node.get("Plan Rows")}
+
+def _candidate(i: int, v: Dict[str, Any], limit_key: Any) -> Dict[str, Any]:
+    if "error" in v:
+        return {"i": i, "ok": False, "error": v["error"]}
+    out = {"i": i, "ok": True, "explain": v}
+    for k in ("total_cost", "est_rows", "est_bytes", "plan_text"):
+        if k in v: out[k] = v[k]
+    # what /approve's cost gate would say, so candidates can be ranked or dropped up front
+    rej = admission.over_limit(limit_key, v)
+    out["admissible"] = rej is None
+    if rej is not None:
+        out["rejected"] = {"reason": rej.reason, "limit": rej.limit, "estimate": rej.estimate}
+    return out
+
+@app.post("/validate/batch")
+def validate_batch(body: BatchBody):
+    """Plan several candidate statements over one backend session."""
+    if not body.sqls:
+        raise HTTPException(400, "sqls must not be empty")
+    if len(body.sqls) > VALIDATE_BATCH_MAX:
+        raise HTTPException(400, f"at most {VALIDATE_BATCH_MAX} statements per batch")
+    rec = load_connection(body.conn_id) if body.conn_id else None
+    conn = build_connector(rec) if rec else connector_registry.build("postgres", APP_RO_DSN)
+    with _admitted(rec) as adm:
+        if hasattr(conn, "validate_many"):
+            res = conn.validate_many(body.sqls)
+        else:
+            res = []
+            for q in body.sqls:
+                cancellation.check()
+                try:
+                    res.append(conn.validate(q))
+                except cancellation.Cancelled:
+                    raise
+                except Exception as e:
+                    res.append({"error": str(e)})
+    key = rec["id"] if rec else "local"
+    return _respond({"results": [_candidate(i, v, key) for i, v in enumerate(res)]}, adm=adm)
+
+def _maybe_spill(cols: List[str], rows: List[Any]) -> Optional[str]:
+    """Keep large results as an Arrow file; returns its content hash (audit preview_hash)."""
+    if not results.should_spill(rows):
+        return None
+    try:
+        return results.spill(cols, rows)
+    except Exception:
+        # the approved result still goes out; it just can't be re-fetched later
+        return None
+
+def _result_ref(aid: int, digest: Optional[str]) -> Dict[str, Any]:
+    return {"result_url": f"/results/{aid}", "result_hash": digest} if digest else {}
 
 @app.post("/approve")
 def approve(body: SQLBody):
+    layout = _layout(body)
+    if body.page_size:
+        return _approve_paged(body, layout)
     # connection-scoped execute + audit into control-plane
     if body.conn_id:
         rec = load_connection(body.conn_id)
         conn = build_connector(rec)
-        cols, rows = conn.execute_readonly(body.sql, limit=body.limit)
+        with _admitted(rec, conn, body.sql, body.limit) as adm:
+            cols, rows = conn.execute_readonly(body.sql, limit=body.limit)
         result_limited = body.limit is not None
+        explain = serialize.dumps_str(adm.estimate) if adm.estimate is not None else None
+        digest = _maybe_spill(cols, rows)
         # audit
-        with get_cp_conn(True) as cp, cp.cursor() as cur:
+        with metrics.stage("audit"), get_cp_conn(True) as cp, cp.cursor() as cur:
             cur.execute("""
-                INSERT INTO audit_events(user_question, sql_text, row_count, result_limited, approval_ts, conn_id, engine, database, schema)
-                VALUES (%s,%s,%s,%s,now(),%s,%s,%s,%s)
+                INSERT INTO audit_events(user_question, sql_text, explain_json, preview_hash, row_count, result_limited, approval_ts, conn_id, engine, database, schema)
+                VALUES (%s,%s,%s,%s,%s,%s,now(),%s,%s,%s,%s)
                 RETURNING id
-            """,(body.question or "", body.sql, len(rows), result_limited, rec["id"], rec["driver"], None, None))
+            """,(body.question or "", body.sql, explain, digest, len(rows), result_limited, rec["id"], rec["driver"], None, None))
             aid = cur.fetchone()[0]
-        return {"ok": True, "row_count": len(rows), "columns": cols, "rows": rows, "audit_id": aid}
+        metrics.RESULT_ROWS.inc(len(rows))
+        return _respond({"ok": True, "row_count": len(rows), "audit_id": aid, **_result_ref(aid, digest),
+                         **serialize.result_payload(cols, rows, layout)}, adm=adm)
     # fallback local
-    with get_cp_conn(False) as c, c.cursor() as cur:
-        cur.execute(body.sql)
+    local = connector_registry.build("postgres", APP_RO_DSN)
+    with _admitted(None, local, body.sql, body.limit, plan=_explain_local) as adm, get_cp_conn(False) as c, cancellation.guard(c.cancel), c.cursor() as cur:
+        with metrics.stage("execute"):
+            cur.execute(local.limited_sql(body.sql, body.limit))
         cols = [d[0] for d in cur.description] if cur.description else []
-        rows = cur.fetchall() if cur.description else []
-        with get_cp_conn(True) as cp, cp.cursor() as cur2:
+        with metrics.stage("fetch"):
+            rows = cur.fetchall() if cur.description else []
+        digest = _maybe_spill(cols, rows)
+        with metrics.stage("audit"), get_cp_conn(True) as cp, cp.cursor() as cur2:
             cur2.execute("""
-                INSERT INTO audit_events(user_question, sql_text, row_count, result_limited, approval_ts)
-                VALUES (%s,%s,%s,%s,now())
+                INSERT INTO audit_events(user_question, sql_text, preview_hash, row_count, result_limited, approval_ts)
+                VALUES (%s,%s,%s,%s,%s,now())
                 RETURNING id
-            """,(body.question or "", body.sql, len(rows), body.limit is not None))
+            """,(body.question or "", body.sql, digest, len(rows), body.limit is not None))
             aid = cur2.fetchone()[0]
-        return {"ok": True, "row_count": len(rows), "columns": cols, "rows": rows, "audit_id": aid}
+        metrics.RESULT_ROWS.inc(len(rows))
+        return _respond({"ok": True, "row_count": len(rows), "audit_id": aid, **_result_ref(aid, digest),
+                         **serialize.result_payload(cols, rows, layout)}, adm=adm)
+
+# -------------------- Stored results --------------------
+@app.get("/results/{audit_id}")
+def get_result(request: Request, audit_id: int, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1),
+               format: str = Query("json", description="json | arrow (Arrow IPC stream)"), layout: str = Query("rows")):
+    """Rows [offset, offset+limit) of an approved result kept by /approve, without re-running it."""
+    if format not in ("json", "arrow"):
+        raise HTTPException(400, "format must be one of json|arrow")
+    if layout not in serialize.LAYOUTS:
+        raise HTTPException(400, f"layout must be one of {'|'.join(serialize.LAYOUTS)}")
+    with get_cp_conn(False) as cp, cp.cursor() as cur:
+        cur.execute("SELECT preview_hash FROM audit_events WHERE id=%s", (audit_id,))
+        row = cur.fetchone()
+    if not row:
+        raise HTTPException(404, f"audit event {audit_id} not found")
+    digest = row[0]
+    if not digest:
+        raise HTTPException(404, f"audit event {audit_id} has no stored result (below the spill threshold or paged)")
+    try:
+        # an evicted result is 410 even for a client still holding its ETag
+        results.ensure_stored(digest)
+        # files are immutable, so hash + range identify the response exactly (weak, as gzip may re-encode it)
+        etag = _etag(digest, offset, limit, format, layout)
+        nm = _not_modified(request, etag, "results")
+        if nm is not None:
+            return nm
+        with metrics.stage("read"):
+            table, total = results.read_slice(digest, offset, limit)
+    except results.Evicted as e:
+        metrics.CACHE.inc(cache="results", result="evicted")
+        raise HTTPException(410, f"{e}; approve the query again")
+    metrics.CACHE.inc(cache="results", result="hit")
+    metrics.RESULT_ROWS.inc(table.num_rows)
+    headers = {"ETag": etag, "X-Total-Rows": str(total), "X-Offset": str(offset)}
+    if format == "arrow":
+        with metrics.stage("encode"):
+            body = results.to_ipc_bytes(table)
+        return Response(body, media_type=results.MEDIA_TYPE, headers=headers)
+    nxt = offset + table.num_rows
+    return _respond({"audit_id": audit_id, "row_count": table.num_rows, "total_rows": total,
+                     "next_offset": nxt if nxt < total else None, **results.to_payload(table, layout)}, headers=headers)
+
+# -------------------- Paged approve (server-held cursors) --------------------
+def _page_response(entry, rows: List[Any], layout: str, adm: Optional[_Admitted] = None) -> Response:
+    metrics.RESULT_ROWS.inc(len(rows))
+    token = entry.token if cursors.STORE.is_open(entry.token) else None
+    return _respond({"ok": True, "row_count": len(rows), "rows_served": entry.rows_served,
+                     "audit_id": entry.audit_id, "cursor": token,
+                     **serialize.result_payload(entry.cursor.columns, rows, layout)}, adm=adm)
+
+def _approve_paged(body: SQLBody, layout: str) -> Response:
+    if body.page_size <= 0:
+        raise HTTPException(400, "page_size must be positive")
+    rec = load_connection(body.conn_id) if body.conn_id else None
+    conn = build_connector(rec) if rec else connector_registry.build("postgres", APP_RO_DSN)
+    driver = rec["driver"] if rec else "local"
+    try:
+        cursors.STORE.reserve(body.conn_id)
+    except cursors.CursorLimitError as e:
+        raise HTTPException(429, str(e))
+    try:
+        with _admitted(rec, conn, body.sql, body.limit) as adm:
+            if hasattr(conn, "open_cursor"):
+                cur = conn.open_cursor(body.sql, limit=body.limit, idle_timeout_s=cursors.STORE.ttl_s)
+            else:
+                cur = cursors.spill_cursor(*conn.execute_readonly(body.sql, limit=body.limit))
+    except BaseException:
+        cursors.STORE.unreserve(body.conn_id)
+        raise
+    entry = cursors.STORE.add(cur, body.conn_id, driver)
+    # total row count is unknown until the cursor is drained, so it is not audited
+    try:
+        with metrics.stage("audit"), get_cp_conn(True) as cp, cp.cursor() as c:
+            c.execute("""
+                INSERT INTO audit_events(user_question, sql_text, explain_json, row_count, result_limited, approval_ts, conn_id, engine, database, schema)
+                VALUES (%s,%s,%s,NULL,%s,now(),%s,%s,%s,%s)
+                RETURNING id
+            """,(body.question or "", body.sql, serialize.dumps_str(adm.estimate) if adm.estimate is not None else None,
+                 body.limit is not None, body.conn_id, rec["driver"] if rec else None, None, None))
+            entry.audit_id = c.fetchone()[0]
+    except Exception:
+        cursors.STORE.close(entry.token)
+        raise
+    with metrics.stage("fetch"):
+        rows = cursors.STORE.fetch(entry, body.page_size)
+    return _page_response(entry, rows, layout, adm)
+
+@app.post("/approve/next")
+def approve_next(body: PageBody):
+    layout = body.layout or "rows"
+    if layout not in serialize.LAYOUTS:
+        raise HTTPException(400, f"layout must be one of {'|'.join(serialize.LAYOUTS)}")
+    try:
+        entry = cursors.STORE.get(body.cursor)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    metrics.bind(driver=entry.driver, conn_id=entry.conn_id)
+    with metrics.stage("fetch"):
+        rows = cursors.STORE.fetch(entry, body.page_size or 1000)
+    return _page_response(entry, rows, layout)
+
+@app.delete("/approve/cursor/{token}")
+def approve_close(token: str):
+    return _respond({"ok": cursors.STORE.close(token)})
 
 # -------------------- existing dataset ingestion stays available --------------------
 @app.post("/datasets/from-url")
 def from_url(body: FromURL):
     # delegate to existing loader script via simple call (kept for backward-compat)
-    return {"ok": True, "note": "URL ingestion retained; Person B/C may hide it in UI later."}
-
-# --- connector registry (inserted) ---
-KIND_TO_CONNECTOR = {}
-try:
-    KIND_TO_CONNECTOR.update({'mysql': MySQLConnector, 'snowflake': SnowflakeConnector})
-except NameError:
-    pass
+    return _respond({"ok": True, "note": "URL ingestion retained; Person B/C may hide it in UI later."})
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Reproducible benchmarks for the API.
+
+  bench.py seed     -- create a synthetic schema in the local Postgres (LOADER_RW_DSN)
+  bench.py run      -- measure /preview, /validate, /approve, /schema/cards under
+                       concurrency, write results JSON
+  bench.py compare  -- diff two results files, exit 1 on regressions
+
+By default `run` starts the API in-process (uvicorn in a thread) with fake
+MySQL/Snowflake connectors bound to `fake://` DSNs, so every driver path can be
+measured against a single local Postgres.  Pass --api to hit a running server.
+
+load_from_url.py is not benchmarked: in this tree it stops after the helper
+functions (no loading code, no CLI), so there is nothing to time yet.
+"""
+import argparse, os, sys, json, time, socket, threading, statistics, resource, subprocess
+import datetime, decimal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import requests
+
+from connectors.connector_base import Connector, single_statement_select_only
+from connectors import registry as connector_registry
+
+TABLE_PREFIX = "bench_t"
+
+# -------------------- synthetic schema --------------------
+def seed(dsn: str, tables: int, rows: int, fact_rows: int, cols: int):
+    import psycopg
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("DROP TABLE IF EXISTS bench_fact")
+        for (name,) in conn.execute("SELECT tablename FROM pg_tables WHERE schemaname='public' AND tablename LIKE %s",
+                                    (TABLE_PREFIX + "%",)).fetchall():
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute("DROP TABLE IF EXISTS bench_dim")
+        conn.execute("CREATE TABLE bench_dim (id int PRIMARY KEY, label text)")
+        conn.execute("INSERT INTO bench_dim SELECT g, 'dim_' || g FROM generate_series(1,100) g")
+        extra = ", ".join(f"attr_{i} text" for i in range(cols))
+        extra_vals = ", ".join(f"md5((g*{i+1})::text)" for i in range(cols))
+        for t in range(tables):
+            name = f"{TABLE_PREFIX}{t:05d}"
+            conn.execute(f"""CREATE TABLE {name} (id bigint PRIMARY KEY, dim_id int REFERENCES bench_dim(id),
+                             created_at timestamptz, amount numeric(12,2){', ' + extra if extra else ''})""")
+            conn.execute(f"""INSERT INTO {name} SELECT g, 1 + g % 100, now() - g * interval '1 minute',
+                             (g % 997)::numeric / 7{', ' + extra_vals if extra_vals else ''}
+                             FROM generate_series(1,%s) g""", (rows,))
+        conn.execute("""CREATE TABLE bench_fact (id bigint PRIMARY KEY, dim_id int REFERENCES bench_dim(id),
+                        created_at timestamptz, amount numeric(12,2), note text)""")
+        conn.execute("""INSERT INTO bench_fact SELECT g, 1 + g % 100, now() - g * interval '1 second',
+                        (g % 997)::numeric / 7, md5(g::text) FROM generate_series(1,%s) g""", (fact_rows,))
+        conn.execute("ANALYZE")
+
+# -------------------- fake connectors --------------------
+class FakeConnector(Connector):
+    """Stand-in for MySQLConnector/SnowflakeConnector: same interface, synthetic data.
+
+    DSN: fake://<driver>?tables=2000&cols=8&rows=1000&latency_ms=2
+    """
+    def __init__(self, dsn: str, timeout_s: int = 15):
+        u = urlparse(dsn)
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        self.dsn = dsn
+        self.driver = u.netloc or "fake"
+        self.tables = int(q.get("tables", 100))
+        self.cols = int(q.get("cols", 8))
+        self.rows = int(q.get("rows", 1000))
+        self.latency_s = float(q.get("latency_ms", 2)) / 1000.0
+
+    def _rtt(self):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _columns(self) -> List[str]:
+        return ["id", "created_at", "amount", "uid"] + [f"attr_{i}" for i in range(self.cols)]
+
+    def _row(self, i: int) -> List[Any]:
+        base = datetime.datetime(2024, 1, 1)
+        return [i, base + datetime.timedelta(minutes=i), decimal.Decimal(i % 997) / 7, f"{i:032x}"] + \
+               [f"value_{i}_{c}" for c in range(self.cols)]
+
+    def test_connection(self) -> Dict[str, Any]:
+        self._rtt()
+        return {"ok": True, "version": f"fake-{self.driver}", "supports_explain_cost": False}
+
+    def enforce_session_readonly(self, conn: Any) -> None:
+        return None
+
+    def introspect_schema(self, limit_samples: int = 5) -> Dict[str, Any]:
+        self._rtt()
+        cols = self._columns()
+        sample_rows = [self._row(i) for i in range(limit_samples)]
+        out = []
+        for t in range(self.tables):
+            out.append({"schema": "bench", "name": f"{TABLE_PREFIX}{t:05d}",
+                        "columns": [{"name": c, "type": "text"} for c in cols],
+                        "samples": {c: [r[j] for r in sample_rows] for j, c in enumerate(cols)}})
+        return {"tables": out}
+
+    def quote_ident(self, name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def limit_clause(self, n: int) -> str:
+        return f" LIMIT {int(n)} "
+
+    def preview(self, sql_text: str, limit: int = 20) -> List[List[Any]]:
+        single_statement_select_only(sql_text)
+        self._rtt()
+        return [self._row(i) for i in range(min(limit, self.rows))]
+
+    def validate(self, sql_text: str) -> Dict[str, Any]:
+        single_statement_select_only(sql_text)
+        self._rtt()
+        return {"est_rows": self.rows, "plan": [{"rows": self.rows}]}
+
+    def execute_readonly(self, sql_text: str, limit: Optional[int] = None) -> Tuple[List[str], List[List[Any]]]:
+        single_statement_select_only(sql_text)
+        self._rtt()
+        n = min(limit, self.rows) if limit else self.rows
+        return self._columns(), [self._row(i) for i in range(n)]
+
+def _install_fakes():
+    # the in-process API only ever sees fake:// DSNs for these drivers, so the
+    # real client libraries are never imported during a bench run
+    for driver in ("mysql", "snowflake"):
+        connector_registry.register(driver, FakeConnector)
+
+# -------------------- in-process API --------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_inprocess_api() -> str:
+    import uvicorn, api
+    _install_fakes()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(base + "/openapi.json", timeout=1).ok:
+                return base
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("in-process API did not start")
+
+# -------------------- load generation --------------------
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    k = min(len(xs) - 1, max(0, int(round(p / 100.0 * (len(xs) - 1)))))
+    return xs[k]
+
+def measure(name: str, fn, n: int, concurrency: int) -> Dict[str, Any]:
+    lat: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    def one(_):
+        nonlocal errors
+        t0 = time.perf_counter()
+        ok = fn()
+        dt = time.perf_counter() - t0
+        with lock:
+            lat.append(dt)
+            if not ok:
+                errors += 1
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    return {"name": name, "concurrency": concurrency, "n": n, "errors": errors,
+            "mean_ms": round(statistics.fmean(lat) * 1000, 3) if lat else 0.0,
+            "p50_ms": round(_pct(lat, 50) * 1000, 3), "p95_ms": round(_pct(lat, 95) * 1000, 3),
+            "p99_ms": round(_pct(lat, 99) * 1000, 3), "rps": round(n / wall, 2) if wall else 0.0}
+
+def _post(session: requests.Session, url: str, body: Dict[str, Any]):
+    def call():
+        r = session.post(url, json=body, timeout=300)
+        r.content
+        return r.ok
+    return call
+
+def _get(session: requests.Session, url: str):
+    def call():
+        r = session.get(url, timeout=300)
+        r.content
+        return r.ok
+    return call
+
+def _register(session: requests.Session, api: str, name: str, driver: str, dsn: str) -> int:
+    r = session.post(f"{api}/connections", json={"name": name, "driver": driver, "dsn": dsn}, timeout=30)
+    r.raise_for_status()
+    return r.json()["id"]
+
+def run_api(api: str, pg_dsn: str, args) -> List[Dict[str, Any]]:
+    s = requests.Session()
+    s.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(args.concurrency)))
+    fake_q = f"tables={args.tables}&cols={args.cols}&rows={args.approve_rows}&latency_ms={args.fake_latency_ms}"
+    conns = {"postgres": _register(s, api, "bench-pg", "postgres", pg_dsn)}
+    if not args.no_fakes:
+        conns["mysql"] = _register(s, api, "bench-fake-mysql", "mysql", f"fake://mysql?{fake_q}")
+        conns["snowflake"] = _register(s, api, "bench-fake-snowflake", "snowflake", f"fake://snowflake?{fake_q}")
+    small = f"SELECT * FROM {TABLE_PREFIX}00000"
+    big = "SELECT * FROM bench_fact"
+    out = []
+    for driver, cid in conns.items():
+        work = {
+            "preview": _post(s, f"{api}/preview", {"conn_id": cid, "sql": small, "limit": 20}),
+            "validate": _post(s, f"{api}/validate", {"conn_id": cid, "sql": big}),
+            "approve": _post(s, f"{api}/approve", {"conn_id": cid, "sql": big, "limit": args.approve_rows,
+                                                    "question": "bench"}),
+        }
+        for conc in args.concurrency:
+            for ep, fn in work.items():
+                res = measure(f"{ep}/{driver}", fn, args.requests, conc)
+                print(json.dumps(res), file=sys.stderr)
+                out.append(res)
+        # introspection is heavy; measure once per driver at low concurrency
+        res = measure(f"schema_cards/{driver}", _get(s, f"{api}/schema/cards?conn_id={cid}&refresh=true"), args.cards_requests, 1)
+        print(json.dumps(res), file=sys.stderr)
+        out.append(res)
+    return out
+
+# -------------------- compare --------------------
+def compare(base_path: str, new_path: str, tolerance: float) -> int:
+    base, new = json.load(open(base_path)), json.load(open(new_path))
+    idx = {(r["name"], r.get("concurrency")): r for r in base.get("results", [])}
+    bad = 0
+    for r in new.get("results", []):
+        b = idx.get((r["name"], r.get("concurrency")))
+        if not b:
+            continue
+        p95 = r["p95_ms"] / b["p95_ms"] - 1 if b["p95_ms"] else 0.0
+        rps = r["rps"] / b["rps"] - 1 if b["rps"] else 0.0
+        flag = p95 > tolerance or rps < -tolerance
+        bad += flag
+        print(f"{'REGRESSION' if flag else 'ok':10s} {r['name']:28s} c={r.get('concurrency')!s:3s} "
+              f"p95 {b['p95_ms']:.1f}->{r['p95_ms']:.1f}ms ({p95:+.0%})  rps {b['rps']:.1f}->{r['rps']:.1f} ({rps:+.0%})")
+    return 1 if bad else 0
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return ""
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sd = sub.add_parser("seed")
+    sd.add_argument("--tables", type=int, default=2000)
+    sd.add_argument("--rows", type=int, default=100, help="rows per synthetic table")
+    sd.add_argument("--fact-rows", type=int, default=200000)
+    sd.add_argument("--cols", type=int, default=8, help="extra text columns per table")
+
+    rn = sub.add_parser("run")
+    rn.add_argument("--api", default=None, help="base URL of a running API; default starts one in-process")
+    rn.add_argument("--pg-dsn", default=os.environ.get("APP_RO_DSN"))
+    rn.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16])
+    rn.add_argument("--requests", type=int, default=200, help="requests per endpoint per concurrency level")
+    rn.add_argument("--cards-requests", type=int, default=3)
+    rn.add_argument("--approve-rows", type=int, default=10000)
+    rn.add_argument("--tables", type=int, default=2000, help="tables reported by fake connectors")
+    rn.add_argument("--cols", type=int, default=8)
+    rn.add_argument("--fake-latency-ms", type=float, default=2.0)
+    rn.add_argument("--no-fakes", action="store_true")
+    rn.add_argument("--out", default="/tmp/bench_results.json")
+
+    cp = sub.add_parser("compare")
+    cp.add_argument("base")
+    cp.add_argument("new")
+    cp.add_argument("--tolerance", type=float, default=0.10)
+
+    args = ap.parse_args()
+
+    if args.cmd == "seed":
+        dsn = os.environ.get("LOADER_RW_DSN")
+        if not dsn:
+            print("LOADER_RW_DSN is not set", file=sys.stderr)
+            sys.exit(2)
+        seed(dsn, args.tables, args.rows, args.fact_rows, args.cols)
+        print(f"seeded {args.tables} tables + bench_fact({args.fact_rows})")
+    elif args.cmd == "run":
+        if not args.pg_dsn:
+            print("Missing --pg-dsn / APP_RO_DSN", file=sys.stderr)
+            sys.exit(2)
+        api = args.api or start_inprocess_api()
+        results = run_api(api, args.pg_dsn, args)
+        report = {
+            "meta": {"git_rev": _git_rev(), "ts": datetime.datetime.utcnow().isoformat() + "Z",
+                     "python": sys.version.split()[0], "inprocess_api": args.api is None,
+                     "params": {k: v for k, v in vars(args).items() if k not in ("cmd",)}},
+            "results": results,
+            # RSS of this process; includes the in-process API when --api is not given
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(args.out)
+    elif args.cmd == "compare":
+        sys.exit(compare(args.base, args.new, args.tolerance))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Request deadlines and backend query cancellation.
+
+Every HTTP request gets a Deadline (X-Request-Timeout header in seconds, else
+REQUEST_TIMEOUT_S, capped at MAX_REQUEST_TIMEOUT_S). It is cancelled when it
+expires or when the client disconnects. Connectors wrap backend work in
+`guard(cancel_fn)`; on cancellation the registered cancel_fn runs on a side
+thread (pg cancel request, MySQL KILL QUERY, Snowflake SYSTEM$CANCEL_QUERY) and
+the driver error that follows is re-raised as `Cancelled`.
+
+Outside a request (CLI tools) there is no deadline and guard() is a no-op.
+"""
+from __future__ import annotations
+import os, time, heapq, asyncio, threading, contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "60"))
+MAX_REQUEST_TIMEOUT_S = float(os.getenv("MAX_REQUEST_TIMEOUT_S", "600"))
+TIMEOUT_HEADER = b"x-request-timeout"
+
+CANCELLED = metrics.Counter("dblens_cancelled_total", "Backend queries cancelled", ("endpoint", "driver", "conn_id", "reason"))
+
+class Cancelled(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"request cancelled: {reason}")
+        self.reason = reason
+
+class Deadline:
+    def __init__(self, timeout_s: float):
+        self.expires = time.monotonic() + timeout_s
+        self.reason: Optional[str] = None
+        self._hooks: Dict[int, Callable[[], None]] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def add_hook(self, fn: Callable[[], None]) -> Optional[int]:
+        with self._lock:
+            if self.reason is not None:
+                return None
+            self._next += 1
+            self._hooks[self._next] = fn
+            return self._next
+
+    def remove_hook(self, key: int) -> None:
+        with self._lock:
+            self._hooks.pop(key, None)
+
+    def cancel(self, reason: str) -> None:
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            hooks = list(self._hooks.values())
+        # cancel requests do network I/O; never run them on the event loop or watchdog
+        for h in hooks:
+            threading.Thread(target=h, name="dblens-cancel", daemon=True).start()
+
+class _Watchdog:
+    """One thread expiring all deadlines, instead of a timer thread per request."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Deadline]] = []
+        self._cv = threading.Condition()
+        self._seq = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, dl: Deadline) -> None:
+        with self._cv:
+            self._seq += 1
+            heapq.heappush(self._heap, (dl.expires, self._seq, dl))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dblens-deadlines", daemon=True)
+                self._thread.start()
+            self._cv.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                expires, _, dl = self._heap[0]
+                delay = expires - time.monotonic()
+                if delay > 0:
+                    self._cv.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            # finished requests are cancelled too, harmlessly: they hold no hooks
+            dl.cancel("deadline")
+
+_watchdog = _Watchdog()
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("dblens_deadline", default=None)
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+def start(timeout_s: float) -> contextvars.Token:
+    dl = Deadline(max(0.001, min(timeout_s, MAX_REQUEST_TIMEOUT_S)))
+    _watchdog.watch(dl)
+    return _current.set(dl)
+
+def finish(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+def check() -> None:
+    dl = _current.get()
+    if dl is not None and dl.cancelled:
+        raise Cancelled(dl.reason)
+
+def timeout_s(default: float) -> float:
+    """Driver/session timeout: `default`, shortened to what is left of this request.
+
+    A deadline only ever lowers the connector's own timeout; a client asking for
+    MAX_REQUEST_TIMEOUT_S does not get 600s statements.
+    """
+    dl = _current.get()
+    return min(float(default), max(1.0, dl.remaining())) if dl is not None else float(default)
+
+def timeout_ms(default_s: float) -> int:
+    return int(timeout_s(default_s) * 1000)
+
+@contextmanager
+def guard(cancel_fn: Callable[[], Any]):
+    """Run backend work that `cancel_fn` can abort from another thread."""
+    dl = _current.get()
+    if dl is None:
+        yield
+        return
+    labels = metrics.bound()
+    lock = threading.Lock()
+    state = {"active": True}
+    def hook():
+        # holding the lock means guard() cannot exit and let the connection run
+        # the next statement while the cancel is in flight
+        with lock:
+            if not state["active"]:
+                return
+            try:
+                cancel_fn()
+            except Exception:
+                pass
+        CANCELLED.inc(**{**labels, "reason": dl.reason})
+    key = dl.add_hook(hook)
+    if key is None:
+        raise Cancelled(dl.reason)
+    try:
+        yield
+    except Cancelled:
+        raise
+    except Exception as e:
+        if dl.cancelled:
+            raise Cancelled(dl.reason) from e
+        raise
+    finally:
+        with lock:
+            state["active"] = False
+        dl.remove_hook(key)
+
+class DeadlineMiddleware:
+    """ASGI middleware: attach a Deadline to each request and cancel it on client disconnect.
+
+    A watcher task is the only reader of `receive`; the app reads the same
+    messages from a queue, so the body is untouched and an http.disconnect is
+    seen even while a sync handler is blocked in the database.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timeout = REQUEST_TIMEOUT_S
+        for k, v in scope.get("headers", []):
+            if k == TIMEOUT_HEADER:
+                try:
+                    timeout = float(v)
+                except ValueError:
+                    pass
+        token = start(timeout)
+        dl = _current.get()
+        queue: asyncio.Queue = asyncio.Queue()
+        async def watch():
+            while True:
+                msg = await receive()
+                await queue.put(msg)
+                if msg["type"] == "http.disconnect":
+                    dl.cancel("client_disconnect")
+                    return
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await self.app(scope, queue.get, send)
+        finally:
+            watcher.cancel()
+            finish(token)
@@ -1,8 +1,33 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple, Optional, Protocol
+from typing import Any, Callable, Dict, List, Tuple, Optional, Protocol
+
+class ServerCursor:
+    """An open result set held between /approve pages.
+
+    `fetch(n)` returns up to n rows ([] when exhausted); `close()` releases the
+    backend cursor and its connection. `ref` is a driver-side handle worth
+    logging (cursor name, Snowflake query id).
+
+    Connectors may implement
+    `open_cursor(sql_text, limit=None, idle_timeout_s=300) -> ServerCursor`;
+    it is optional, callers fall back to paging a materialized result.
+    """
+    def __init__(self, columns: List[str], fetch: Callable[[int], List[Any]], close: Callable[[], None], ref: Optional[str] = None):
+        self.columns = columns
+        self._fetch = fetch
+        self._close = close
+        self.ref = ref
+
+    def fetch(self, n: int) -> List[Any]:
+        return self._fetch(n)
+
+    def close(self) -> None:
+        self._close()
 
 class Connector(Protocol):
     driver: str  # 'postgres' | 'mysql' | 'snowflake'
+    # estimate keys validate() fills in; the cost gate only runs when one of them has a limit
+    estimates: Tuple[str, ...] = ("total_cost", "est_rows", "est_bytes")
 
     def test_connection(self) -> Dict[str, Any]: ...
     def enforce_session_readonly(self, conn: Any) -> None: ...
@@ -13,6 +38,32 @@ class Connector(Protocol):
     def quote_ident(self, name: str) -> str: ...
     def limit_clause(self, n: int) -> str: ...
 
+    def limited_sql(self, sql_text: str, limit: Optional[int] = None) -> str:
+        """The statement execute_readonly()/open_cursor() run for `limit`; the admission cost gate validates this one."""
+        return sql_text if not limit else f"SELECT * FROM ({sql_text}) AS t {self.limit_clause(limit)}"
+
+    def estimate(self, sql_text: str) -> Dict[str, Any]:
+        """What the cost gate checks; drivers whose validate() does more than plan once override it."""
+        return self.validate(sql_text)
+
+# Connectors may also implement
+#   validate_many(sql_texts) -> List[Dict]
+# planning every statement over one session; each entry is what validate()
+# returns for that statement, or {"error": "..."}. Optional like open_cursor:
+# callers fall back to one validate() per statement.
+
+def precheck_many(sql_texts: List[str]) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+    """For validate_many(): gate every statement; returns (results with gate errors filled in, indexes to plan)."""
+    out: List[Optional[Dict[str, Any]]] = [None] * len(sql_texts)
+    todo = []
+    for i, q in enumerate(sql_texts):
+        try:
+            single_statement_select_only(q)
+            todo.append(i)
+        except ValueError as e:
+            out[i] = {"error": str(e)}
+    return out, todo
+
 def single_statement_select_only(sql_text: str) -> None:
     # quick gate; Person A scope — parser can be swapped later
     bad = (";"," UPDATE "," DELETE "," INSERT "," MERGE "," TRUNCATE "," CREATE "," ALTER "," DROP ",
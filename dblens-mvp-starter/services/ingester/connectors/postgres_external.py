@@ -1,25 +1,34 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Tuple, Optional
+import secrets
 import psycopg
 from psycopg.rows import dict_row
-from .connector_base import Connector, single_statement_select_only
+from .connector_base import Connector, ServerCursor, single_statement_select_only, precheck_many
+import metrics
+import cancellation
 
 class PostgresExternal(Connector):
     driver = "postgres"
+    estimates = ("total_cost", "est_rows")
 
     def __init__(self, dsn: str, timeout_s: int = 15):
         self.dsn = dsn
         self.timeout_s = timeout_s
 
-    def _connect(self):
-        conn = psycopg.connect(self.dsn, autocommit=True)
-        with conn.cursor() as cur:
-            cur.execute("SET LOCAL statement_timeout = 5000")
+    def _connect(self, autocommit: bool = True):
+        """Read-only session; autocommit=False for callers that need a transaction (named cursors)."""
+        with metrics.stage("connect"):
+            conn = psycopg.connect(self.dsn, autocommit=True)
+        with metrics.stage("session"), conn.cursor() as cur:
+            # session-level: SET LOCAL is a no-op outside a transaction block
+            cur.execute(f"SET statement_timeout = {cancellation.timeout_ms(self.timeout_s)}")
             cur.execute("SET default_transaction_read_only = on")
+        if not autocommit:
+            conn.autocommit = False
         return conn
 
     def test_connection(self) -> Dict[str, Any]:
-        with self._connect() as conn, conn.cursor() as cur:
+        with self._connect() as conn, cancellation.guard(conn.cancel), conn.cursor() as cur:
             cur.execute("select version()")
             ver = cur.fetchone()[0]
             return {"ok": True, "version": ver, "supports_explain_cost": True}
@@ -28,8 +37,28 @@ class PostgresExternal(Connector):
         with conn.cursor() as cur:
             cur.execute("SET default_transaction_read_only = on")
 
+    def replication_lag_s(self, conn: Any) -> Optional[float]:
+        """Seconds this server trails its primary; None on a primary, 0 on a caught-up standby.
+
+        pg_last_xact_replay_timestamp() alone keeps growing on an idle primary's
+        standbys, so a standby that has replayed everything it received counts as current --
+        but only while a WAL receiver is streaming. A standby that lost its upstream has
+        also replayed all it received; its lag is the age of the last replayed commit.
+        (Without pg_read_all_stats the receiver's status reads NULL; a running receiver
+        process is taken as streaming then.)
+        """
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT CASE WHEN NOT pg_is_in_recovery() THEN NULL
+                            WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE coalesce(status, 'streaming') = 'streaming')
+                                 AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                            ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END
+            """)
+            lag = cur.fetchone()[0]
+            return float(lag) if lag is not None else None
+
     def introspect_schema(self, limit_samples: int = 5) -> Dict[str, Any]:
-        with self._connect() as conn, conn.cursor(row_factory=dict_row) as cur:
+        with self._connect() as conn, cancellation.guard(conn.cancel), conn.cursor(row_factory=dict_row) as cur:
             cur.execute("""
                 SELECT table_schema, table_name
                 FROM information_schema.tables
@@ -66,30 +95,107 @@ class PostgresExternal(Connector):
 
     def preview(self, sql_text: str, limit: int = 20) -> List[List[Any]]:
         single_statement_select_only(sql_text)
-        with self._connect() as conn, conn.cursor() as cur:
-            cur.execute(f"WITH cte AS ({sql_text}) SELECT * FROM cte {self.limit_clause(limit)}")
-            return cur.fetchall()
+        with self._connect() as conn, cancellation.guard(conn.cancel), conn.cursor() as cur:
+            with metrics.stage("execute"):
+                cur.execute(f"WITH cte AS ({sql_text}) SELECT * FROM cte {self.limit_clause(limit)}")
+            with metrics.stage("fetch"):
+                return cur.fetchall()
+
+    @staticmethod
+    def _plan_summary(plan) -> Dict[str, Any]:
+        # flatten basic metrics
+        node = plan[0]["Plan"]
+        return {
+            "total_cost": node.get("Total Cost"),
+            "est_rows": node.get("Plan Rows"),
+            "plan": plan
+        }
 
     def validate(self, sql_text: str) -> Dict[str, Any]:
         single_statement_select_only(sql_text)
-        with self._connect() as conn, conn.cursor(row_factory=dict_row) as cur:
-            cur.execute(f"EXPLAIN (FORMAT JSON) {sql_text}")
-            plan = cur.fetchone()["QUERY PLAN"]
-            # flatten basic metrics
-            def dive(p):
-                node = p[0]["Plan"]
-                return {
-                    "total_cost": node.get("Total Cost"),
-                    "est_rows": node.get("Plan Rows"),
-                    "plan": p
-                }
-            return dive(plan)
+        with self._connect() as conn, cancellation.guard(conn.cancel), conn.cursor(row_factory=dict_row) as cur:
+            with metrics.stage("execute"):
+                cur.execute(f"EXPLAIN (FORMAT JSON) {sql_text}")
+                plan = cur.fetchone()["QUERY PLAN"]
+            return self._plan_summary(plan)
+
+    def validate_many(self, sql_texts: List[str]) -> List[Dict[str, Any]]:
+        """validate() for several statements over one session.
+
+        All EXPLAINs go out in a single pipeline (one round trip) when libpq
+        supports it. A failing statement aborts the rest of the pipeline, so
+        whatever is still unanswered afterwards is planned one by one.
+        """
+        out, todo = precheck_many(sql_texts)
+        if not todo:
+            return out
+        with self._connect() as conn, cancellation.guard(conn.cancel):
+            if len(todo) > 1 and psycopg.Pipeline.is_supported():
+                curs = {}
+                with metrics.stage("execute"):
+                    try:
+                        with conn.pipeline():
+                            for i in todo:
+                                curs[i] = conn.cursor()
+                                curs[i].execute(f"EXPLAIN (FORMAT JSON) {sql_texts[i]}")
+                    except psycopg.Error:
+                        pass
+                    for i, cur in curs.items():
+                        try:
+                            out[i] = self._plan_summary(cur.fetchone()[0])
+                        except (psycopg.Error, TypeError):
+                            pass  # failed or aborted: retried below
+            with metrics.stage("execute"), conn.cursor() as cur:
+                for i in todo:
+                    if out[i] is not None:
+                        continue
+                    cancellation.check()
+                    try:
+                        cur.execute(f"EXPLAIN (FORMAT JSON) {sql_texts[i]}")
+                        out[i] = self._plan_summary(cur.fetchone()[0])
+                    except psycopg.Error as e:
+                        if conn.broken:
+                            raise
+                        out[i] = {"error": str(e).strip()}
+        return out
 
     def execute_readonly(self, sql_text:str, limit: Optional[int]=None)->Tuple[List[str], List[List[Any]]]:
         single_statement_select_only(sql_text)
-        with self._connect() as conn, conn.cursor() as cur:
-            q = sql_text if not limit else f"WITH cte AS ({sql_text}) SELECT * FROM cte {self.limit_clause(limit)}"
-            cur.execute(q)
+        with self._connect() as conn, cancellation.guard(conn.cancel), conn.cursor() as cur:
+            q = self.limited_sql(sql_text, limit)
+            with metrics.stage("execute"):
+                cur.execute(q)
             cols = [d[0] for d in cur.description] if cur.description else []
-            rows = cur.fetchall() if cur.description else []
+            with metrics.stage("fetch"):
+                rows = cur.fetchall() if cur.description else []
             return cols, rows
+
+    def open_cursor(self, sql_text:str, limit: Optional[int]=None, idle_timeout_s:int=300)->ServerCursor:
+        single_statement_select_only(sql_text)
+        # named (server-side) cursors live inside a transaction, so no autocommit here;
+        # going through _connect keeps endpoint routing (failover, lag checks) in play
+        conn = self._connect(autocommit=False)
+        try:
+            with metrics.stage("session"):
+                # if we never come back for the next page, the server drops the cursor itself
+                conn.execute(f"SET idle_in_transaction_session_timeout = {int(idle_timeout_s) * 1000 + 5000}")
+            name = "dblens_" + secrets.token_hex(6)
+            cur = conn.cursor(name=name)
+            q = self.limited_sql(sql_text, limit)
+            with cancellation.guard(conn.cancel), metrics.stage("execute"):
+                cur.execute(q)
+            cols = [d[0] for d in cur.description] if cur.description else []
+        except Exception:
+            conn.close()
+            raise
+        def fetch(n:int)->List[Any]:
+            # pages are read by later requests, each under its own deadline
+            with cancellation.guard(conn.cancel):
+                return cur.fetchmany(n)
+        def close():
+            try:
+                cur.close()
+                conn.rollback()
+            finally:
+                conn.close()
+        return ServerCursor(cols, fetch, close, ref=name)
@@ -0,0 +1,124 @@
+"""Driver name -> connector class, imported on first use.
+
+Driver packages are heavy (snowflake.connector alone costs a noticeable chunk
+of import time and memory), so nothing here imports a connector module until a
+connection with that driver is actually built. Workers and CLI runs only pay
+for the drivers they touch.
+
+Drivers come from three places, later ones winning (an installed plugin can
+replace a built-in of the same name):
+
+- the built-ins below;
+- the `dblens.connectors` entry-point group, for connectors shipped as
+  installed packages:  [project.entry-points."dblens.connectors"]
+                       clickhouse = "dblens_clickhouse:ClickHouseConnector"
+- CONNECTOR_PLUGINS="name=module:Class,..." in the environment, and
+  register() at runtime (tests, bench fakes).
+
+A target is a "module:attr" string or the class itself. Whatever it resolves to
+is called as `cls(dsn)` and must implement connectors.connector_base.Connector.
+"""
+from __future__ import annotations
+import os, time, threading, importlib
+from typing import Any, Callable, Dict, List, Union
+
+import metrics
+
+ENTRY_POINT_GROUP = "dblens.connectors"
+
+BUILTIN = {
+    "postgres": "connectors.postgres_external:PostgresExternal",
+    "mysql": "connectors.mysql:MySQLConnector",
+    "snowflake": "connectors.snowflake:SnowflakeConnector",
+}
+
+IMPORT_SECONDS = metrics.Gauge("dblens_connector_import_seconds", "Time spent importing each connector driver on first use", ("driver",))
+
+Target = Union[str, Callable[..., Any]]
+
+class UnknownDriver(ValueError):
+    pass
+
+class DriverUnavailable(ValueError):
+    """The driver is registered but its module (or the client library it needs) failed to import."""
+
+_targets: Dict[str, Any] = dict(BUILTIN)
+_loaded: Dict[str, Callable[..., Any]] = {}
+_scanned = False
+_lock = threading.RLock()
+
+def _parse_plugins(raw: str) -> Dict[str, str]:
+    out = {}
+    for item in raw.split(","):
+        if "=" in item:
+            name, target = item.split("=", 1)
+            out[name.strip()] = target.strip()
+    return out
+
+def _scan() -> None:
+    """Collect plugin names once; entry points are listed here but only loaded in get()."""
+    global _scanned
+    if _scanned:
+        return
+    with _lock:
+        if _scanned:
+            return
+        try:
+            from importlib.metadata import entry_points
+            for ep in entry_points(group=ENTRY_POINT_GROUP):
+                _targets[ep.name] = ep
+        except Exception:
+            pass
+        for name, target in _parse_plugins(os.getenv("CONNECTOR_PLUGINS", "")).items():
+            _targets[name] = target
+        _scanned = True
+
+def register(name: str, target: Target) -> None:
+    """Add or replace a driver; takes effect for connectors built afterwards."""
+    _scan()
+    with _lock:
+        _targets[name] = target
+        _loaded.pop(name, None)
+
+def drivers() -> List[str]:
+    """Registered driver names (nothing is imported)."""
+    _scan()
+    with _lock:
+        return sorted(_targets)
+
+def is_loaded(name: str) -> bool:
+    return name in _loaded
+
+def _resolve(target: Any) -> Callable[..., Any]:
+    if isinstance(target, str):
+        mod, _, attr = target.partition(":")
+        obj = importlib.import_module(mod)
+        for part in attr.split(".") if attr else ():
+            obj = getattr(obj, part)
+        return obj
+    if hasattr(target, "load") and hasattr(target, "group"):
+        return target.load()  # importlib.metadata.EntryPoint
+    return target
+
+def get(name: str) -> Callable[..., Any]:
+    cls = _loaded.get(name)
+    if cls is not None:
+        return cls
+    _scan()
+    with _lock:
+        cls = _loaded.get(name)
+        if cls is not None:
+            return cls
+        if name not in _targets:
+            raise UnknownDriver(f"unsupported driver: {name} (known: {', '.join(sorted(_targets))})")
+        t0 = time.perf_counter()
+        try:
+            cls = _resolve(_targets[name])
+        except ImportError as e:
+            raise DriverUnavailable(f"driver {name} is not available: {e}") from e
+        IMPORT_SECONDS.set(time.perf_counter() - t0, driver=name)
+        _loaded[name] = cls
+        return cls
+
+def build(driver: str, dsn: str, **kw: Any):
+    return get(driver)(dsn, **kw)
@@ -0,0 +1,205 @@
+"""Spread a connection's read-only traffic over its primary and replicas.
+
+A connection row may list replica_dsns next to its dsn. RoutedConnector looks
+like a single connector but holds one driver connector per endpoint and, for
+every call, tries endpoints in order of
+
+    ewma_connect_ms * (1 + in_flight)
+
+(unmeasured endpoints go first so they get measured; ties favour the primary).
+Connect latency, session setup included, stands in for round-trip time since
+it does not depend on the query.
+
+- failover: a connect error marks the endpoint down for ENDPOINT_RETRY_S and
+  the call moves on to the next one. Only connect errors fail over; an error
+  from the query itself is the caller's.
+- lag: with max_replica_lag_s set, endpoints whose connector implements
+  replication_lag_s(conn) are checked at most every LAG_CHECK_INTERVAL_S;
+  a replica further behind is skipped until its next check.
+
+Stats live at module level, keyed by conn_id and endpoint, so they survive the
+per-request connector instances.
+"""
+from __future__ import annotations
+import os, time, threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .connector_base import ServerCursor
+from . import registry
+import metrics
+
+ENDPOINT_RETRY_S = float(os.getenv("ENDPOINT_RETRY_S", "30"))
+LAG_CHECK_INTERVAL_S = float(os.getenv("LAG_CHECK_INTERVAL_S", "5"))
+EWMA_ALPHA = 0.3
+
+# `target` (primary/replicaN), not `endpoint`: everywhere else that label is the route path
+_LABELS = ("driver", "conn_id", "target")
+INFLIGHT = metrics.Gauge("dblens_endpoint_inflight", "Backend calls in flight per connection endpoint", _LABELS)
+CONNECT_MS = metrics.Gauge("dblens_endpoint_connect_ms", "Smoothed connect latency per connection endpoint", _LABELS)
+LAG_SECONDS = metrics.Gauge("dblens_endpoint_replication_lag_seconds", "Last measured replication lag per endpoint", _LABELS)
+FAILOVERS = metrics.Counter("dblens_endpoint_failovers_total", "Endpoints skipped mid-call (connect error or too much lag)", _LABELS + ("reason",))
+
+class EndpointDown(Exception):
+    def __init__(self, reason: str, error: Exception):
+        super().__init__(f"{reason}: {error}")
+        self.reason = reason
+        self.error = error
+
+class _Stats:
+    __slots__ = ("ewma_ms", "inflight", "down_until", "lag_s", "lag_checked")
+
+    def __init__(self):
+        self.ewma_ms: Optional[float] = None
+        self.inflight = 0
+        self.down_until = 0.0
+        self.lag_s: Optional[float] = None
+        self.lag_checked = 0.0
+
+_stats: Dict[tuple, _Stats] = {}
+_lock = threading.Lock()
+
+def _stats_for(key: tuple) -> _Stats:
+    with _lock:
+        st = _stats.get(key)
+        if st is None:
+            st = _stats[key] = _Stats()
+        return st
+
+class _Endpoint:
+    def __init__(self, router: "RoutedConnector", idx: int, dsn: str):
+        self.name = "primary" if idx == 0 else f"replica{idx}"
+        self.idx = idx
+        self.connector = router._cls(dsn)
+        self.labels = {"driver": router.driver, "conn_id": router.conn_id, "target": self.name}
+        self.stats = _stats_for((router.conn_id, idx, dsn))
+        self.max_lag_s = router.max_lag_s
+        # the driver connector calls self._connect() for every operation; wrap it so
+        # connect failures and lag are seen here, before any statement has run
+        if hasattr(self.connector, "_connect"):
+            orig = self.connector._connect
+            self.connector._connect = lambda *a, **kw: self._connect(orig, *a, **kw)
+
+    def _connect(self, orig: Callable[..., Any], *a, **kw):
+        t0 = time.perf_counter()
+        try:
+            conn = orig(*a, **kw)
+        except Exception as e:
+            raise EndpointDown("connect_error", e) from e
+        ms = (time.perf_counter() - t0) * 1000
+        st = self.stats
+        with _lock:
+            st.ewma_ms = ms if st.ewma_ms is None else EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * st.ewma_ms
+        CONNECT_MS.set(st.ewma_ms, **self.labels)
+        if self.max_lag_s and self.lag_due():
+            self.check_lag(conn)
+        if self.lagging():
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise EndpointDown("replication_lag", RuntimeError(f"{self.name} is {self.stats.lag_s:.1f}s behind (max {self.max_lag_s:g}s)"))
+        return conn
+
+    def lag_due(self) -> bool:
+        return hasattr(self.connector, "replication_lag_s") and time.monotonic() - self.stats.lag_checked >= LAG_CHECK_INTERVAL_S
+
+    def check_lag(self, conn: Any) -> None:
+        try:
+            lag = self.connector.replication_lag_s(conn)
+        except Exception:
+            lag = None  # e.g. no privilege to read replication state; don't hold it against the host
+        self.stats.lag_s = lag
+        self.stats.lag_checked = time.monotonic()
+        if lag is not None:
+            LAG_SECONDS.set(lag, **self.labels)
+
+    def lagging(self) -> bool:
+        return bool(self.max_lag_s) and self.stats.lag_s is not None and self.stats.lag_s > self.max_lag_s
+
+    def available(self) -> bool:
+        if self.stats.down_until > time.monotonic():
+            return False
+        # a lagging replica gets another look once its lag reading is stale
+        return not self.lagging() or self.lag_due()
+
+    def score(self) -> float:
+        st = self.stats
+        return (st.ewma_ms or 0.0) * (1 + st.inflight)
+
+    def acquire(self) -> None:
+        with _lock:
+            self.stats.inflight += 1
+        INFLIGHT.inc(**self.labels)
+
+    def release(self) -> None:
+        with _lock:
+            self.stats.inflight -= 1
+        INFLIGHT.dec(**self.labels)
+
+class RoutedConnector:
+    """A connector over several endpoints of the same source (primary first)."""
+
+    def __init__(self, driver: str, dsns: List[str], conn_id: Any = "", max_lag_s: Optional[float] = None):
+        self.driver = driver
+        self.conn_id = conn_id
+        self.max_lag_s = float(max_lag_s) if max_lag_s else None
+        self._cls = registry.get(driver)
+        self.endpoints = [_Endpoint(self, i, d) for i, d in enumerate(dsns)]
+
+    def order(self) -> List[_Endpoint]:
+        up = [e for e in self.endpoints if e.available()]
+        # everything down: still try them all (primary first) rather than fail without trying
+        return sorted(up, key=lambda e: (e.score(), e.idx)) if up else list(self.endpoints)
+
+    def _call(self, name: str, *a, **kw):
+        last: Optional[EndpointDown] = None
+        for ep in self.order():
+            ep.acquire()
+            held = False
+            try:
+                res = getattr(ep.connector, name)(*a, **kw)
+                if isinstance(res, ServerCursor):
+                    # the endpoint stays busy until the cursor is closed
+                    res = ServerCursor(res.columns, res.fetch, _once(res.close, ep.release), ref=res.ref)
+                    held = True
+                return res
+            except EndpointDown as e:
+                if e.reason == "connect_error":
+                    ep.stats.down_until = time.monotonic() + ENDPOINT_RETRY_S
+                FAILOVERS.inc(**ep.labels, reason=e.reason)
+                last = e
+            finally:
+                if not held:
+                    ep.release()
+        raise last.error
+
+    def __getattr__(self, name: str):
+        # forward exactly the methods the driver connector has, so hasattr() checks
+        # for optional ones (open_cursor, validate_many) still answer correctly
+        if name == "estimates":
+            return getattr(self._cls, name)
+        if name.startswith("_") or not callable(getattr(self._cls, name, None)):
+            raise AttributeError(name)
+        if name in ("quote_ident", "limit_clause", "limited_sql"):
+            return getattr(self.endpoints[0].connector, name)
+        return lambda *a, **kw: self._call(name, *a, **kw)
+
+def _once(close: Callable[[], None], after: Callable[[], None]) -> Callable[[], None]:
+    done = threading.Event()
+    def fn():
+        if done.is_set():
+            return
+        done.set()
+        try:
+            close()
+        finally:
+            after()
+    return fn
+
+def build(rec: Dict[str, Any]):
+    """Connector for a connections row: plain when it has no replicas, routed otherwise."""
+    replicas = [d for d in (rec.get("replica_dsns") or []) if d]
+    if not replicas:
+        return registry.build(rec["driver"], rec["dsn"])
+    return RoutedConnector(rec["driver"], [rec["dsn"], *replicas], conn_id=rec.get("id", ""),
+                           max_lag_s=rec.get("max_replica_lag_s"))
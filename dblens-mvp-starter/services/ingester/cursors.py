@@ -0,0 +1,177 @@
+"""Server-held cursors behind paged /approve results.
+
+A cursor is opened once, handed out as an opaque token, and read page by page
+until it is exhausted, closed, or idle for longer than CURSOR_TTL_S (a daemon
+thread reaps those). Each conn_id may hold at most CURSOR_MAX_PER_CONN open
+cursors so abandoned clients cannot pin a source's connections.
+
+Connectors that implement open_cursor() keep the result on the backend
+(Postgres named cursor, MySQL unbuffered cursor, Snowflake query id); others
+run the query once and are paged from a spilled NDJSON file.
+"""
+from __future__ import annotations
+import os, json, time, secrets, tempfile, threading
+from typing import Any, Dict, List, Optional
+
+from connectors.connector_base import ServerCursor
+import metrics
+import serialize
+
+CURSOR_TTL_S = int(os.getenv("CURSOR_TTL_S", "300"))
+CURSOR_MAX_PER_CONN = int(os.getenv("CURSOR_MAX_PER_CONN", "4"))
+CURSOR_SPILL_DIR = os.getenv("CURSOR_SPILL_DIR", "/tmp")
+
+OPEN = metrics.Gauge("dblens_cursors_open", "Paged /approve cursors currently open", ("driver", "conn_id"))
+REAPED = metrics.Counter("dblens_cursors_reaped_total", "Cursors closed because they sat idle past the TTL", ("driver", "conn_id"))
+
+class CursorLimitError(Exception):
+    pass
+
+def spill_cursor(cols: List[str], rows: List[Any]) -> ServerCursor:
+    """Page an already-materialized result from a temp file instead of holding it in memory."""
+    fd, path = tempfile.mkstemp(prefix="dblens_cursor_", suffix=".ndjson", dir=CURSOR_SPILL_DIR)
+    with os.fdopen(fd, "wb") as f:
+        for r in rows:
+            f.write(serialize.dumps(list(r.values()) if isinstance(r, dict) else r))
+            f.write(b"\n")
+    fh = open(path, "rb")
+    def fetch(n: int) -> List[Any]:
+        out = []
+        for _ in range(n):
+            line = fh.readline()
+            if not line:
+                break
+            out.append(json.loads(line))
+        return out
+    def close():
+        fh.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return ServerCursor(cols, fetch, close, ref=path)
+
+class _Entry:
+    __slots__ = ("token", "cursor", "conn_id", "driver", "last_used", "rows_served", "lock", "audit_id")
+
+    def __init__(self, token: str, cursor: ServerCursor, conn_id: Any, driver: str):
+        self.token = token
+        self.cursor = cursor
+        self.conn_id = conn_id
+        self.driver = driver
+        self.last_used = time.monotonic()
+        self.rows_served = 0
+        self.lock = threading.Lock()
+        self.audit_id = None
+
+class CursorStore:
+    def __init__(self, ttl_s: int = CURSOR_TTL_S, max_per_conn: int = CURSOR_MAX_PER_CONN):
+        self.ttl_s = ttl_s
+        self.max_per_conn = max_per_conn
+        self._entries: Dict[str, _Entry] = {}
+        self._reserved: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def _held(self, conn_id: Any) -> int:
+        # caller holds self._lock
+        return sum(1 for e in self._entries.values() if e.conn_id == conn_id) + self._reserved.get(conn_id, 0)
+
+    def reserve(self, conn_id: Any) -> None:
+        """Claim one of conn_id's cursor slots before running the query.
+
+        The claim is held until add() turns it into an open cursor or
+        unreserve() gives it back, so concurrent requests can't all pass the
+        cap and run their queries only to be refused afterwards.
+        """
+        self.reap()
+        with self._lock:
+            n = self._held(conn_id)
+            if n >= self.max_per_conn:
+                raise CursorLimitError(f"connection {conn_id} already has {n} open or opening cursors (max {self.max_per_conn})")
+            self._reserved[conn_id] = self._reserved.get(conn_id, 0) + 1
+
+    def _release(self, conn_id: Any) -> None:
+        # caller holds self._lock
+        n = self._reserved.get(conn_id, 0) - 1
+        if n > 0:
+            self._reserved[conn_id] = n
+        else:
+            self._reserved.pop(conn_id, None)
+
+    def unreserve(self, conn_id: Any) -> None:
+        with self._lock:
+            self._release(conn_id)
+
+    def add(self, cursor: ServerCursor, conn_id: Any, driver: str) -> _Entry:
+        """Register an opened cursor in the slot reserve() claimed for it."""
+        e = _Entry(secrets.token_urlsafe(18), cursor, conn_id, driver)
+        with self._lock:
+            self._release(conn_id)
+            self._entries[e.token] = e
+        OPEN.inc(driver=driver, conn_id=conn_id)
+        self._ensure_reaper()
+        return e
+
+    def get(self, token: str) -> _Entry:
+        with self._lock:
+            e = self._entries.get(token)
+        if e is None:
+            raise LookupError("cursor not found or expired")
+        return e
+
+    def is_open(self, token: str) -> bool:
+        with self._lock:
+            return token in self._entries
+
+    def fetch(self, e: _Entry, n: int) -> List[Any]:
+        """Read the next page; closes the cursor once it comes back short."""
+        try:
+            with e.lock:
+                e.last_used = time.monotonic()
+                rows = e.cursor.fetch(n)
+                e.rows_served += len(rows)
+        except Exception:
+            # a failed fetch (e.g. an aborted transaction) leaves nothing worth resuming
+            self.close(e.token)
+            raise
+        if len(rows) < n:
+            self.close(e.token)
+        return rows
+
+    def close(self, token: str) -> bool:
+        with self._lock:
+            e = self._entries.pop(token, None)
+        if e is None:
+            return False
+        OPEN.dec(driver=e.driver, conn_id=e.conn_id)
+        with e.lock:
+            try:
+                e.cursor.close()
+            except Exception:
+                pass
+        return True
+
+    def reap(self) -> int:
+        cutoff = time.monotonic() - self.ttl_s
+        with self._lock:
+            stale = [e for e in self._entries.values() if e.last_used < cutoff and not e.lock.locked()]
+        n = 0
+        for e in stale:
+            if self.close(e.token):
+                REAPED.inc(driver=e.driver, conn_id=e.conn_id)
+                n += 1
+        return n
+
+    def _ensure_reaper(self) -> None:
+        def loop():
+            while True:
+                time.sleep(max(1, min(30, self.ttl_s // 2)))
+                self.reap()
+        with self._lock:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=loop, name="dblens-cursor-reaper", daemon=True)
+            self._reaper.start()
+
+STORE = CursorStore()
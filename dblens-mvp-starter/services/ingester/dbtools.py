@@ -1,21 +1,8 @@
-import json
-
-# --- JSON default encoder for datetimes/decimals/others ---
-def _jd(obj):
-    try:
-        import datetime, decimal
-        if isinstance(obj, (datetime.datetime, datetime.date)):
-            return obj.isoformat()
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-    except Exception:
-        pass
-    return str(obj)
-# ----------------------------------------------------------
-
 #!/usr/bin/env python3
-import argparse, os, sys, json
+import argparse, os, sys, json, time, queue, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import psycopg
+import serialize
 
 def get_dsn(role="app"):
     dsn = os.environ.get("APP_RO_DSN") if role == "app" else os.environ.get("LOADER_RW_DSN")
@@ -100,22 +87,180 @@ def schema_cards():
             })
     return out
 
+PREVIEW_TIMEOUT_MS = 5000
+
+def _preview_on(conn, sql_text: str, limit=20):
+    return conn.execute(f"WITH cte AS ({sql_text}) SELECT * FROM cte LIMIT %s", (limit,))
+
+def _explain_on(conn, sql_text: str):
+    plan = conn.execute("EXPLAIN (FORMAT JSON) " + sql_text).fetchone()[0]
+    root = plan[0].get("Plan", {})
+    total_cost = root.get("Total Cost")
+    est_rows = root.get("Plan Rows")
+    plan_width = root.get("Plan Width")
+    return {"explain_json": plan, "total_cost": total_cost, "est_rows": est_rows, "plan_width": plan_width}
+
 def preview(sql_text: str, limit=20):
     dsn = get_dsn("app")
     with psycopg.connect(dsn) as conn:
-        conn.execute("SET statement_timeout = '5000ms'")
-        rows = conn.execute(f"WITH cte AS ({sql_text}) SELECT * FROM cte LIMIT %s", (limit,)).fetchall()
-        return rows
+        conn.execute(f"SET statement_timeout = '{PREVIEW_TIMEOUT_MS}ms'")
+        return _preview_on(conn, sql_text, limit).fetchall()
 
 def explain(sql_text: str):
     dsn = get_dsn("app")
     with psycopg.connect(dsn) as conn:
-        plan = conn.execute("EXPLAIN (FORMAT JSON) " + sql_text).fetchone()[0]
-        root = plan[0].get("Plan", {})
-        total_cost = root.get("Total Cost")
-        est_rows = root.get("Plan Rows")
-        plan_width = root.get("Plan Width")
-        return {"explain_json": plan, "total_cost": total_cost, "est_rows": est_rows, "plan_width": plan_width}
+        return _explain_on(conn, sql_text)
+
+# -------------------- batch mode --------------------
+def split_statements(text: str):
+    """Split a SQL script on top-level semicolons (quotes, E'' escapes, comments and $$ bodies respected)."""
+    out, buf, i, n = [], [], 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in ("'", '"'):
+            # E'...' strings take backslash escapes (E'it\'s'); the E must start a word
+            esc = c == "'" and i > 0 and text[i - 1] in "eE" and (i < 2 or not (text[i - 2].isalnum() or text[i - 2] in "_$"))
+            j = i + 1
+            while j < n:
+                if esc and text[j] == "\\":
+                    j += 2
+                    continue
+                if text[j] == c:
+                    if j + 1 < n and text[j + 1] == c:  # doubled quote
+                        j += 2
+                        continue
+                    break
+                j += 1
+            buf.append(text[i:j + 1]); i = j + 1
+        elif text.startswith("--", i):
+            j = text.find("\n", i)
+            j = n if j < 0 else j
+            buf.append(text[i:j]); i = j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            buf.append(text[i:j]); i = j
+        elif c == "$":
+            j = text.find("$", i + 1)
+            tag = text[i:j + 1] if j > 0 else ""
+            if tag and (tag == "$$" or tag[1:-1].replace("_", "").isalnum()):
+                k = text.find(tag, j + 1)
+                k = n if k < 0 else k + len(tag)
+                buf.append(text[i:k]); i = k
+            else:
+                buf.append(c); i += 1
+        elif c == ";":
+            out.append("".join(buf)); buf = []; i += 1
+        else:
+            buf.append(c); i += 1
+    out.append("".join(buf))
+    return [s.strip() for s in out if _has_code(s)]
+
+def _has_code(stmt: str) -> bool:
+    for line in stmt.splitlines():
+        line = line.strip()
+        if line and not line.startswith("--"):
+            return True
+    return False
+
+def read_statements(path: str):
+    """[(id, sql)] from a .sql script or NDJSON lines ({"id": ..., "sql": ...}); "-" reads stdin."""
+    text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8").read()
+    first = text.lstrip()[:1]
+    if path.endswith((".ndjson", ".jsonl")) or first == "{":
+        stmts = []
+        for n, line in enumerate(text.splitlines()):
+            if line.strip():
+                d = json.loads(line)
+                stmts.append((d.get("id", n), d["sql"]))
+        return stmts
+    return list(enumerate(split_statements(text)))
+
+class ConnPool:
+    """A fixed set of autocommit connections shared by the batch workers."""
+
+    def __init__(self, dsn: str, size: int, setup=()):
+        self.dsn = dsn
+        self.setup = list(setup)
+        self._idle: "queue.Queue" = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(None)  # opened on first use
+
+    def _open(self):
+        conn = psycopg.connect(self.dsn, autocommit=True)
+        for stmt in self.setup:
+            conn.execute(stmt)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def run(self, fn):
+        conn = self._idle.get()
+        try:
+            if conn is None or conn.closed or conn.broken:
+                conn = self._open()
+            return fn(conn)
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for c in self._all:
+                c.close()
+            self._all = []
+
+def _pct(xs, p):
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100.0 * (len(xs) - 1))))]
+
+def run_batch(stmts, work, concurrency: int, out, setup=()):
+    """Run work(conn, sql) for each statement; one NDJSON line per statement in completion order."""
+    pool = ConnPool(get_dsn("app"), max(1, concurrency), setup)
+    def one(i, sid, sql):
+        t0 = time.perf_counter()
+        rec = {"i": i, "id": sid}
+        try:
+            rec.update(pool.run(lambda c: work(c, sql)))
+            rec["ok"] = True
+        except Exception as e:
+            rec.update({"ok": False, "error": f"{type(e).__name__}: {str(e).strip()}"})
+        rec["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return rec
+    t0 = time.perf_counter()
+    lat, errors = [], 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+            futs = [ex.submit(one, i, sid, sql) for i, (sid, sql) in enumerate(stmts)]
+            for f in as_completed(futs):
+                rec = f.result()
+                lat.append(rec["ms"])
+                errors += 0 if rec["ok"] else 1
+                out.write(serialize.dumps(rec) + b"\n")
+                out.flush()
+    finally:
+        pool.close()
+    return {"statements": len(stmts), "errors": errors, "concurrency": concurrency,
+            "wall_ms": round((time.perf_counter() - t0) * 1000, 2),
+            "p50_ms": _pct(lat, 50), "p95_ms": _pct(lat, 95), "max_ms": max(lat, default=0.0)}
+
+def preview_batch(stmts, limit: int, concurrency: int, out):
+    def work(conn, sql):
+        cur = _preview_on(conn, sql, limit)
+        rows = cur.fetchall()
+        return {"columns": [d[0] for d in cur.description or []], "row_count": len(rows), "rows": rows}
+    return run_batch(stmts, work, concurrency, out, setup=[f"SET statement_timeout = '{PREVIEW_TIMEOUT_MS}ms'"])
+
+def validate_batch(stmts, concurrency: int, out, plans: bool = False):
+    def work(conn, sql):
+        rep = _explain_on(conn, sql)
+        if not plans:
+            rep.pop("explain_json")
+        return rep
+    return run_batch(stmts, work, concurrency, out)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -131,19 +276,43 @@ def main():
     vd = sub.add_parser("validate")
     vd.add_argument("--sql", required=True)
 
+    for name in ("preview-batch", "validate-batch"):
+        b = sub.add_parser(name, help="run many statements over a small connection pool, NDJSON out")
+        b.add_argument("--file", default="-", help=".sql script (split on ;) or NDJSON {id, sql} lines; - for stdin")
+        b.add_argument("--concurrency", type=int, default=4)
+        b.add_argument("--out", default="-", help="NDJSON output file; - for stdout")
+        if name == "preview-batch":
+            b.add_argument("--limit", type=int, default=20)
+        else:
+            b.add_argument("--plans", action="store_true", help="include the full EXPLAIN JSON per statement")
+
     args = ap.parse_args()
 
     if args.cmd == "schema-cards":
         data = schema_cards()
-        with open(args.out, "w") as f:
-            json.dump({"SchemaCard": data}, f, indent=2, default=str)
+        with open(args.out, "wb") as f:
+            f.write(serialize.dumps({"SchemaCard": data}, indent=True))
         print(args.out)
     elif args.cmd == "preview":
         rows = preview(args.sql, args.limit)
         for r in rows: print(r)
     elif args.cmd == "validate":
         rep = explain(args.sql)
-        print(json.dumps(rep, indent=2))
+        print(serialize.dumps_str(rep, indent=True))
+    elif args.cmd in ("preview-batch", "validate-batch"):
+        stmts = read_statements(args.file)
+        out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+        try:
+            if args.cmd == "preview-batch":
+                summary = preview_batch(stmts, args.limit, args.concurrency, out)
+            else:
+                summary = validate_batch(stmts, args.concurrency, out, args.plans)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        # summary on stderr keeps stdout pure NDJSON
+        print(serialize.dumps_str(summary), file=sys.stderr)
+        sys.exit(1 if summary["errors"] else 0)
 
 if __name__ == "__main__":
     main()
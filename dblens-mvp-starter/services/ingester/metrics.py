@@ -0,0 +1,162 @@
+"""Tiny in-process metrics registry rendered in Prometheus text format (0.0.4).
+
+Kept dependency-free on purpose: observing a value is a dict lookup, a bisect
+and a lock, so it is cheap enough to wrap every stage of every request.
+
+Labels that are the same for a whole request (endpoint, driver, conn_id) are
+bound once via `bind()` and picked up by `stage()` from a contextvar, so the
+connectors can time themselves without knowing who called them.
+"""
+from __future__ import annotations
+import time, threading, contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+# seconds; tuned for "local pg is ~1ms, warehouse is ~seconds"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_bound: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("dblens_metric_labels", default={})
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        b = _bound.get()
+        return tuple(str(labels[n]) if n in labels else b.get(n, "") for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._series[k] = self._series.get(k, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._series.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._series[k] = float(value)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                # [per-bucket counts..., +Inf count], sum
+                s = self._series[k] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(s[0]), s[1])) for k, s in self._series.items()]
+        out = []
+        for k, (counts, total) in items:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_label = 'le="%s"' % _num(le)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_num(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {acc}")
+        return out
+
+REGISTRY: List[_Metric] = []
+
+# -------------------- DBLens metrics --------------------
+STAGE_LABELS = ("endpoint", "driver", "conn_id", "stage")
+SCOPE_LABELS = ("endpoint", "driver", "conn_id")
+
+REQUESTS = Counter("dblens_http_requests_total", "HTTP requests by endpoint and status", ("endpoint", "method", "status"))
+REQUEST_SECONDS = Histogram("dblens_http_request_seconds", "End-to-end HTTP request latency", ("endpoint", "method"))
+STAGE_SECONDS = Histogram("dblens_stage_seconds", "Latency of one request stage (load_connection, connect, session, execute, fetch, encode, audit)", STAGE_LABELS)
+STAGE_ERRORS = Counter("dblens_stage_errors_total", "Stages that raised", STAGE_LABELS)
+INFLIGHT = Gauge("dblens_backend_inflight", "Backend calls currently running per connection", SCOPE_LABELS)
+RESULT_ROWS = Counter("dblens_result_rows_total", "Rows returned to clients", SCOPE_LABELS)
+CACHE = Counter("dblens_cache_requests_total", "Cache lookups by cache and result (hit, miss, refresh, ...)", ("cache", "result"))
+
+def bind(**labels) -> contextvars.Token:
+    """Merge `labels` into the labels bound for the current request/context."""
+    merged = dict(_bound.get())
+    merged.update({k: "" if v is None else str(v) for k, v in labels.items()})
+    return _bound.set(merged)
+
+def reset(token: contextvars.Token) -> None:
+    _bound.reset(token)
+
+def bound() -> Dict[str, str]:
+    """Snapshot of the bound labels, for work that finishes on another thread."""
+    return dict(_bound.get())
+
+@contextmanager
+def stage(name: str, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name, **labels)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=name, **labels)
+
+def render() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.header())
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,180 @@
+"""Approved results kept on local disk as Arrow IPC files.
+
+/approve results estimated above RESULTS_SPILL_MIN_BYTES (as JSON) are written
+to RESULTS_DIR as `<sha256>.arrow` and the hash goes into
+audit_events.preview_hash, so GET /results/{audit_id} can serve the result
+again without re-running the query. Files are content-addressed (identical
+results share one file) and immutable. Reads memory-map the file and slice the
+requested row range without copying. When the directory grows past
+RESULTS_QUOTA_BYTES the least recently read files are evicted; their audit rows
+keep the hash, and /results answers 410 for them.
+
+RESULTS_DIR must outlive the process (docker-compose mounts the `results`
+volume there); a wiped directory turns every stored result into a 410.
+pyarrow is imported on first spill/read, not with the API.
+"""
+from __future__ import annotations
+import os, json, hashlib, tempfile, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+import serialize
+
+RESULTS_DIR = os.getenv("RESULTS_DIR", "/tmp/dblens_results")
+RESULTS_SPILL_MIN_BYTES = int(os.getenv("RESULTS_SPILL_MIN_BYTES", str(1 << 20)))
+RESULTS_QUOTA_BYTES = int(os.getenv("RESULTS_QUOTA_BYTES", str(2 << 30)))
+BATCH_ROWS = 65536
+SUFFIX = ".arrow"
+MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# field metadata marking a string column that holds one JSON document per value
+JSON_FIELD_META = {b"dblens.encoding": b"json"}
+
+SPILLED = metrics.Counter("dblens_results_spilled_total", "Approved results written to Arrow files", ("endpoint", "driver", "conn_id"))
+EVICTED = metrics.Counter("dblens_results_evicted_total", "Arrow result files evicted to stay under quota", ())
+DISK_BYTES = metrics.Gauge("dblens_results_disk_bytes", "Bytes held in RESULTS_DIR", ())
+
+_evict_lock = threading.Lock()
+
+class Evicted(Exception):
+    pass
+
+def estimate_json_bytes(rows: List[Any], sample: int = 100) -> int:
+    """Encoded size of `rows`, extrapolated from the first `sample` rows."""
+    if not rows:
+        return 0
+    head = rows[:sample]
+    return len(serialize.dumps(head)) * len(rows) // len(head)
+
+def should_spill(rows: List[Any]) -> bool:
+    return RESULTS_SPILL_MIN_BYTES > 0 and estimate_json_bytes(rows) >= RESULTS_SPILL_MIN_BYTES
+
+def _is_document_column(values: List[Any]) -> bool:
+    """Nested values (JSON/arrays) or more than one Python type in the column."""
+    kinds = {type(v) for v in values if v is not None}
+    return len(kinds) > 1 or any(issubclass(k, (dict, list, tuple)) for k in kinds)
+
+def _column(pa, name: str, values: List[Any]):
+    """(field, array) for one result column.
+
+    Scalar columns of a single type become native Arrow arrays. Anything else
+    is stored as JSON text, every value encoded the same way (SQL NULL stays
+    null), since inferring a struct from dicts would turn missing keys into
+    nulls and str() of mixed values loses the types.
+    """
+    if not _is_document_column(values):
+        try:
+            arr = pa.array(values)
+            return pa.field(name, arr.type), arr
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+            # single but unsupported type (UUID, ints wider than 64 bits, ...)
+            pass
+    arr = pa.array([None if v is None else serialize.dumps_str(v) for v in values], type=pa.string())
+    return pa.field(name, pa.string(), metadata=JSON_FIELD_META), arr
+
+def to_table(cols: List[str], rows: List[Any]):
+    import pyarrow as pa
+    data = serialize.columnar(rows, len(cols))
+    fields, arrays = zip(*(_column(pa, n, c) for n, c in zip(cols, data))) if cols else ((), ())
+    return pa.Table.from_arrays(list(arrays), schema=pa.schema(list(fields)))
+
+def path_for(digest: str) -> str:
+    if not digest or any(c not in "0123456789abcdef" for c in digest):
+        raise ValueError("bad result hash")
+    return os.path.join(RESULTS_DIR, digest + SUFFIX)
+
+def spill(cols: List[str], rows: List[Any]) -> str:
+    """Write rows as an Arrow IPC file; returns its sha256 (also its name)."""
+    import pyarrow as pa
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with metrics.stage("spill"):
+        table = to_table(cols, rows)
+        fd, tmp = tempfile.mkstemp(prefix=".spill_", suffix=SUFFIX, dir=RESULTS_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as w:
+                w.write_table(table, max_chunksize=BATCH_ROWS)
+            h = hashlib.sha256()
+            with open(tmp, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            final = path_for(digest)
+            if os.path.exists(final):
+                os.unlink(tmp)
+                os.utime(final)
+            else:
+                os.replace(tmp, final)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    SPILLED.inc()
+    enforce_quota(keep=final)
+    return digest
+
+def enforce_quota(keep: Optional[str] = None) -> int:
+    """Evict least recently read files until RESULTS_DIR fits the quota; returns files removed."""
+    with _evict_lock:
+        files = []
+        try:
+            with os.scandir(RESULTS_DIR) as it:
+                for e in it:
+                    if e.is_file() and e.name.endswith(SUFFIX) and not e.name.startswith("."):
+                        st = e.stat()
+                        files.append((st.st_mtime, st.st_size, e.path))
+        except FileNotFoundError:
+            return 0
+        total = sum(f[1] for f in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= RESULTS_QUOTA_BYTES:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            EVICTED.inc()
+        DISK_BYTES.set(total)
+        return removed
+
+def ensure_stored(digest: str) -> None:
+    """Raise Evicted unless the result file is still on disk (cheap; nothing is read)."""
+    if not os.path.exists(path_for(digest)):
+        raise Evicted(f"result {digest[:12]} is no longer on disk")
+
+def read_slice(digest: str, offset: int = 0, limit: Optional[int] = None):
+    """(slice, total_rows) for rows [offset, offset+limit) of a spilled result.
+
+    The file is memory-mapped and the slice references its pages directly, so
+    nothing is decoded or copied until the caller serializes it.
+    """
+    import pyarrow as pa
+    path = path_for(digest)
+    try:
+        source = pa.memory_map(path, "r")
+    except FileNotFoundError:
+        raise Evicted(f"result {digest[:12]} is no longer on disk")
+    # reads count as use for LRU eviction
+    os.utime(path)
+    table = pa.ipc.open_file(source).read_all()
+    return table.slice(offset, limit), table.num_rows
+
+def to_ipc_bytes(table) -> bytes:
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as w:
+        w.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def to_payload(table, layout: str = "rows") -> Dict[str, Any]:
+    cols = table.column_names
+    data = [c.to_pylist() for c in table.columns]
+    for n, f in enumerate(table.schema):
+        if (f.metadata or {}).get(b"dblens.encoding") == b"json":
+            data[n] = [None if v is None else json.loads(v) for v in data[n]]
+    if layout == "columns":
+        return {"columns": cols, "data": data}
+    return {"columns": cols, "rows": [list(r) for r in zip(*data)] if data else []}
@@ -0,0 +1,276 @@
+"""In-memory search index over schema_card_cache, backing GET /schema/search.
+
+One index per conn_id. Each cached table is a document whose tokens come from
+the schema, table and column names (split on _ / camelCase, singularized) and
+string sample values, with per-field weights. Query tokens match exactly or,
+failing that, through a trigram index over the vocabulary, so "custmer" and
+"cust" still find customer tables. Top hits also lift their FK neighbours
+(declared foreign_keys when the card has them, else `<table>_id` naming).
+
+The index is refreshed incrementally: /schema/cards upserts the tables it just
+cached, and searches compare each row's refreshed_at with the one last indexed
+for it, pulling only rows that changed or appeared and dropping rows that are
+gone. Comparing per row (rather than against the newest timestamp seen) keeps
+refreshes that commit late and deletes offset by inserts from slipping by.
+"""
+from __future__ import annotations
+import re, math, threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import metrics
+
+FIELD_WEIGHTS = {"table": 3.0, "column": 2.0, "schema": 1.0, "sample": 0.5}
+FUZZY_MIN_SIM = 0.45
+FK_BOOST = 0.3
+MAX_SAMPLE_TOKENS_PER_COLUMN = 20
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "by", "to", "and", "or", "is", "are", "was", "were", "be",
+    "what", "which", "who", "how", "many", "much", "show", "list", "give", "me", "all", "each", "per",
+    "with", "from", "that", "this", "their", "there", "do", "does", "did", "top", "most", "last", "first",
+}
+
+_split_camel = re.compile(r"([a-z0-9])([A-Z])")
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+def _norm(tok: str) -> str:
+    if len(tok) > 4 and tok.endswith("ies"):
+        return tok[:-3] + "y"
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+        return tok[:-1]
+    return tok
+
+def tokenize(text: Any) -> List[str]:
+    s = _split_camel.sub(r"\1 \2", str(text)).lower()
+    return [_norm(t) for t in _non_alnum.split(s) if t and t not in STOPWORDS]
+
+def _trigrams(tok: str) -> Set[str]:
+    t = f"  {tok} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+class _Doc:
+    __slots__ = ("fqn", "schema", "name", "columns", "fks", "terms")
+
+    def __init__(self, fqn: str, schema: str, name: str, columns: List[str], fks: List[str], terms: Dict[str, Tuple[float, Set[str]]]):
+        self.fqn = fqn
+        self.schema = schema
+        self.name = name
+        self.columns = columns
+        self.fks = fks
+        # token -> (weight, columns the token came from)
+        self.terms = terms
+
+def _build_doc(fqn: str, columns: Iterable[Dict[str, Any]], samples: Optional[Dict[str, Any]], fks: Optional[List[Dict[str, Any]]]) -> _Doc:
+    schema, _, name = fqn.partition(".")
+    terms: Dict[str, Tuple[float, Set[str]]] = {}
+    def add(tok: str, w: float, col: Optional[str] = None):
+        cur_w, cols = terms.get(tok, (0.0, set()))
+        if col:
+            cols.add(col)
+        terms[tok] = (max(cur_w, w), cols)
+    for t in tokenize(schema):
+        add(t, FIELD_WEIGHTS["schema"])
+    for t in tokenize(name):
+        add(t, FIELD_WEIGHTS["table"])
+    col_names = []
+    for c in columns or []:
+        cname = c.get("name") if isinstance(c, dict) else str(c)
+        if not cname:
+            continue
+        col_names.append(cname)
+        for t in tokenize(cname):
+            add(t, FIELD_WEIGHTS["column"], cname)
+    for cname, vals in (samples or {}).items():
+        seen = 0
+        for v in vals or []:
+            if not isinstance(v, str):
+                continue
+            for t in tokenize(v):
+                if len(t) < 3 or t.isdigit():
+                    continue
+                add(t, FIELD_WEIGHTS["sample"], cname)
+                seen += 1
+            if seen >= MAX_SAMPLE_TOKENS_PER_COLUMN:
+                break
+    refs = [fk.get("ref_table", "") for fk in (fks or []) if isinstance(fk, dict)]
+    return _Doc(fqn, schema, name, col_names, refs, terms)
+
+class SchemaIndex:
+    """Inverted + trigram index over one connection's cached tables."""
+
+    def __init__(self):
+        self.docs: Dict[str, _Doc] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.trigrams: Dict[str, Set[str]] = defaultdict(set)
+        # fqn -> refreshed_at of the cache row it was indexed from
+        self.stamps: Dict[str, Any] = {}
+        self.lock = threading.RLock()
+        self._edges: Optional[Dict[str, Set[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def upsert(self, fqn: str, columns, samples=None, fks=None, stamp: Any = None) -> None:
+        doc = _build_doc(fqn, columns, samples, fks)
+        with self.lock:
+            self._edges = None
+            self._remove(fqn)
+            self.docs[fqn] = doc
+            self.stamps[fqn] = stamp
+            for tok, (w, _) in doc.terms.items():
+                if tok not in self.postings:
+                    for g in _trigrams(tok):
+                        self.trigrams[g].add(tok)
+                self.postings[tok][fqn] = w
+
+    def remove(self, fqn: str) -> None:
+        with self.lock:
+            self._edges = None
+            self._remove(fqn)
+
+    def _remove(self, fqn: str) -> None:
+        self.stamps.pop(fqn, None)
+        old = self.docs.pop(fqn, None)
+        if old is None:
+            return
+        for tok in old.terms:
+            p = self.postings.get(tok)
+            if p is None:
+                continue
+            p.pop(fqn, None)
+            if not p:
+                del self.postings[tok]
+                for g in _trigrams(tok):
+                    s = self.trigrams.get(g)
+                    if s is not None:
+                        s.discard(tok)
+                        if not s:
+                            del self.trigrams[g]
+
+    def _expand(self, tok: str) -> List[Tuple[str, float]]:
+        """Vocabulary terms for a query token: exact, prefix, then trigram-similar."""
+        if tok in self.postings:
+            return [(tok, 1.0)]
+        grams = _trigrams(tok)
+        counts: Dict[str, int] = defaultdict(int)
+        for g in grams:
+            for cand in self.trigrams.get(g, ()):
+                counts[cand] += 1
+        out = []
+        for cand, n in counts.items():
+            sim = n / float(len(grams | _trigrams(cand)))
+            if cand.startswith(tok) and len(tok) >= 3:
+                sim = max(sim, 0.8)
+            if sim >= FUZZY_MIN_SIM:
+                out.append((cand, sim))
+        out.sort(key=lambda x: -x[1])
+        return out[:5]
+
+    def _graph(self) -> Dict[str, Set[str]]:
+        """Undirected FK graph, rebuilt lazily after upserts."""
+        if self._edges is not None:
+            return self._edges
+        by_name: Dict[str, str] = {}
+        for f, d in self.docs.items():
+            by_name.setdefault(d.name.lower(), f)
+        edges: Dict[str, Set[str]] = defaultdict(set)
+        def link(a: str, b: str):
+            if a != b:
+                edges[a].add(b)
+                edges[b].add(a)
+        for f, d in self.docs.items():
+            for r in d.fks:
+                if r in self.docs:
+                    link(f, r)
+            for c in d.columns:
+                lc = c.lower()
+                if lc.endswith("_id") and lc != "id":
+                    base = lc[:-3]
+                    for cand in (base, base + "s", base + "es"):
+                        if cand in by_name:
+                            link(f, by_name[cand])
+                            break
+        self._edges = edges
+        return edges
+
+    def search(self, question: str, k: int = 10) -> List[Dict[str, Any]]:
+        qtoks = list(dict.fromkeys(tokenize(question)))
+        with self.lock:
+            n_docs = max(1, len(self.docs))
+            scores: Dict[str, float] = defaultdict(float)
+            matched: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: {"tokens": set(), "columns": set()})
+            for qt in qtoks:
+                for term, sim in self._expand(qt):
+                    post = self.postings.get(term, {})
+                    idf = math.log(1.0 + n_docs / (1.0 + len(post)))
+                    for fqn, w in post.items():
+                        scores[fqn] += sim * w * idf
+                        m = matched[fqn]
+                        m["tokens"].add(term)
+                        m["columns"].update(self.docs[fqn].terms[term][1])
+            if not scores:
+                return []
+            # FK proximity: neighbours of strong hits inherit part of their score
+            graph = self._graph()
+            head = sorted(scores.items(), key=lambda x: -x[1])[: max(k, 5)]
+            for fqn, sc in head:
+                for other in graph.get(fqn, ()):
+                    scores[other] += FK_BOOST * sc
+            ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]
+            out = []
+            for fqn, sc in ranked:
+                d = self.docs[fqn]
+                m = matched.get(fqn, {"tokens": set(), "columns": set()})
+                out.append({"table": fqn, "schema": d.schema, "name": d.name, "score": round(sc, 4),
+                            "matched_tokens": sorted(m["tokens"]), "matched_columns": sorted(m["columns"]),
+                            "columns": d.columns, "related": sorted(graph.get(fqn, ()))})
+            return out
+
+class SearchIndexes:
+    """conn_id -> SchemaIndex, kept in sync with schema_card_cache."""
+
+    def __init__(self):
+        self._by_conn: Dict[Any, SchemaIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, conn_id: Any) -> SchemaIndex:
+        with self._lock:
+            idx = self._by_conn.get(conn_id)
+            if idx is None:
+                idx = self._by_conn[conn_id] = SchemaIndex()
+            return idx
+
+    def upsert_card(self, conn_id: Any, card: Dict[str, Any], stamps: Dict[str, Any]) -> None:
+        """Index a freshly cached card; `stamps` are the cache rows' refreshed_at, so sync() sees them as current."""
+        idx = self.get(conn_id)
+        for t in card.get("tables", []):
+            fqn = f'{t.get("schema","")}.{t.get("name","")}'
+            if fqn in stamps:
+                idx.upsert(fqn, t.get("columns", []), t.get("samples", {}), t.get("foreign_keys"), stamp=stamps[fqn])
+
+    def sync(self, conn_id: Any, cp_conn) -> SchemaIndex:
+        """Re-index cache rows whose refreshed_at differs from the indexed one; drop deleted rows."""
+        idx = self.get(conn_id)
+        with idx.lock:
+            with cp_conn.cursor() as cur:
+                cur.execute("SELECT table_fqn, refreshed_at FROM schema_card_cache WHERE conn_id=%s", (conn_id,))
+                current = dict(cur.fetchall())
+                gone = [f for f in idx.stamps if f not in current]
+                changed = [f for f, ts in current.items() if f not in idx.stamps or idx.stamps[f] != ts]
+                if not gone and not changed:
+                    metrics.CACHE.inc(cache="schema_search", result="hit")
+                    return idx
+                rows = []
+                if changed:
+                    cur.execute("""SELECT table_fqn, columns_json, samples_json, refreshed_at FROM schema_card_cache
+                                   WHERE conn_id=%s AND table_fqn = ANY(%s)""", (conn_id, changed))
+                    rows = cur.fetchall()
+            for fqn in gone:
+                idx.remove(fqn)
+            for fqn, cols, samples, ts in rows:
+                idx.upsert(fqn, cols or [], samples or {}, stamp=ts)
+            metrics.CACHE.inc(cache="schema_search", result="refresh")
+            return idx
+
+INDEXES = SearchIndexes()
@@ -0,0 +1,76 @@
+"""Row/result serialization straight to JSON bytes.
+
+Driver rows (tuples, lists, dict_rows) go out without a jsonable_encoder pass.
+orjson is used when installed (it handles datetime/UUID/numpy natively); the
+stdlib json module with the same `default` hook is the fallback, so the type
+mapping is the same either way.
+
+Type mapping: datetime/date/time -> ISO 8601, Decimal -> float, UUID -> str,
+timedelta -> seconds, bytes -> base64 (always, so clients decode one way),
+numpy scalars/arrays -> Python numbers/lists.
+"""
+from __future__ import annotations
+import json, base64, datetime, decimal, uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    orjson = None
+    HAVE_ORJSON = False
+
+LAYOUTS = ("rows", "columns")
+
+def default(obj: Any) -> Any:
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(obj)).decode("ascii")
+    if type(obj).__module__ == "numpy":
+        # numpy scalar or ndarray; avoid importing numpy just to isinstance-check
+        return obj.tolist() if hasattr(obj, "tolist") else obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+if HAVE_ORJSON:
+    _OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    if HAVE_ORJSON:
+        try:
+            return orjson.dumps(obj, default=default, option=_OPTS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            # e.g. ints wider than 64 bits; the stdlib path handles them
+            pass
+    return json.dumps(obj, default=default, indent=2 if indent else None,
+                      separators=None if indent else (",", ":"), ensure_ascii=False).encode("utf-8")
+
+def dumps_str(obj: Any, indent: bool = False) -> str:
+    return dumps(obj, indent=indent).decode("utf-8")
+
+def _as_seq(row: Any) -> Sequence[Any]:
+    return list(row.values()) if isinstance(row, dict) else row
+
+def columnar(rows: List[Any], ncols: Optional[int] = None) -> List[List[Any]]:
+    """Transpose rows into one array per column (`columns` layout)."""
+    if not rows:
+        return [[] for _ in range(ncols or 0)]
+    return [list(c) for c in zip(*(_as_seq(r) for r in rows))]
+
+def result_payload(cols: Optional[List[str]], rows: List[Any], layout: str = "rows") -> Dict[str, Any]:
+    """Shape a result set for the wire.
+
+    rows:    {"columns": [...], "rows": [[...], ...]}
+    columns: {"columns": [...], "data": [[col0 values], [col1 values], ...]}
+    """
+    if layout == "columns":
+        return {"columns": cols or [], "data": columnar(rows, len(cols or []))}
+    return {"columns": cols or [], "rows": rows}
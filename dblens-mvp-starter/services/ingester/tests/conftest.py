@@ -0,0 +1,4 @@
+import os, sys
+
+# the service's modules are imported top-level (`import metrics`), as in the container's /app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+import admission
+
+def test_fair_slots_refuse_beyond_max_waiting():
+    s = admission.FairSlots(1, max_waiting=1)
+    assert s.acquire(0)
+    got = []
+    t = threading.Thread(target=lambda: got.append(s.acquire(5)))
+    t.start()
+    while not s.waiting:
+        pass
+    with pytest.raises(admission.QueueFull):
+        s.acquire(5)
+    s.release()
+    t.join()
+    assert got == [True] and s.used == 1
+
+def test_fair_slots_timeout():
+    s = admission.FairSlots(1)
+    assert s.acquire(0)
+    assert s.acquire(0.01) is False
+    assert s.waiting == 0
+
+def test_cost_checks_follow_driver_estimates(monkeypatch):
+    monkeypatch.setitem(admission.DEFAULT_LIMITS, "max_bytes", 0)
+    assert admission.cost_checks_enabled(1)
+    assert admission.cost_checks_enabled(1, ("total_cost", "est_rows"))
+    # Snowflake only returns est_bytes, which has no limit by default
+    assert not admission.cost_checks_enabled(1, ("est_bytes",))
+    monkeypatch.setitem(admission.DEFAULT_LIMITS, "max_bytes", 1e9)
+    assert admission.cost_checks_enabled(1, ("est_bytes",))
+
+def test_over_limit(monkeypatch):
+    monkeypatch.setitem(admission.DEFAULT_LIMITS, "max_bytes", 0)
+    rej = admission.over_limit("x", {"total_cost": admission.DEFAULT_LIMITS["max_total_cost"] + 1})
+    assert rej is not None and rej.reason == "max_total_cost"
+    assert admission.over_limit("x", {"est_bytes": 1e12}) is None
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+pytest.importorskip("psycopg")
+import dbtools
+from dbtools import split_statements
+
+def test_split_plain_and_trailing():
+    assert split_statements("select 1; select 2;\n") == ["select 1", "select 2"]
+
+def test_split_quotes():
+    assert split_statements("select 'a;b'; select \"x;y\" from t; select 'it''s; ok'") == [
+        "select 'a;b'", 'select "x;y" from t', "select 'it''s; ok'"]
+
+def test_split_e_strings():
+    assert split_statements(r"select E'it\'s; fine'; select e'a\\'; select 2") == [
+        r"select E'it\'s; fine'", r"select e'a\\'", "select 2"]
+    # a backslash is literal in a plain string, and "some'..." is not an E-string
+    assert split_statements(r"select 'a\'; select some'x\'; select 3") == [
+        r"select 'a\'", r"select some'x\'", "select 3"]
+
+def test_split_dollar_quotes():
+    sql = "create function f() returns int as $$ begin return 1; end $$ language plpgsql; select $tag$ a;b $tag$"
+    assert split_statements(sql) == [
+        "create function f() returns int as $$ begin return 1; end $$ language plpgsql", "select $tag$ a;b $tag$"]
+
+def test_split_comments():
+    sql = "-- header; not a statement\nselect 1 /* a; b */ ;\n-- only a comment;\n"
+    assert split_statements(sql) == ["-- header; not a statement\nselect 1 /* a; b */"]
+
+def test_read_statements_ndjson(tmp_path):
+    p = tmp_path / "q.ndjson"
+    p.write_text('{"id": "a", "sql": "select 1"}\n\n{"sql": "select 2"}\n')
+    assert dbtools.read_statements(str(p)) == [("a", "select 1"), (2, "select 2")]
+
+class _Cur:
+    def __init__(self, rows, description=None):
+        self.rows = rows
+        self.description = description
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+class _Conn:
+    closed = broken = False
+
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params=None):
+        self.log.append(sql)
+        if "boom" in sql:
+            raise RuntimeError("boom")
+        if sql.startswith("EXPLAIN"):
+            return _Cur([([{"Plan": {"Total Cost": 1.5, "Plan Rows": 3, "Plan Width": 8}}],)])
+        return _Cur([(1,), (2,)], [("x",)])
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def fake_pg(monkeypatch):
+    log = []
+    monkeypatch.setenv("APP_RO_DSN", "postgresql://fake")
+    monkeypatch.setattr(dbtools.psycopg, "connect", lambda dsn, autocommit=False: _Conn(log))
+    return log
+
+def _run(monkeypatch, capsys, *argv):
+    monkeypatch.setattr("sys.argv", ["dbtools.py", *argv])
+    with pytest.raises(SystemExit) as e:
+        dbtools.main()
+    return e.value.code, json.loads(capsys.readouterr().err)
+
+def test_preview_batch_cli(fake_pg, tmp_path, monkeypatch, capsys):
+    src, out = tmp_path / "q.sql", tmp_path / "out.ndjson"
+    src.write_text("select 1; select 2;")
+    code, summary = _run(monkeypatch, capsys, "preview-batch", "--file", str(src), "--out", str(out), "--concurrency", "2")
+    assert code == 0 and summary["statements"] == 2 and summary["errors"] == 0
+    recs = sorted((json.loads(l) for l in out.read_text().splitlines()), key=lambda r: r["i"])
+    assert [r["row_count"] for r in recs] == [2, 2]
+    assert recs[0]["columns"] == ["x"] and recs[0]["ok"]
+    assert any(s.startswith("SET statement_timeout") for s in fake_pg)
+
+def test_validate_batch_cli_reports_errors(fake_pg, tmp_path, monkeypatch, capsys):
+    src, out = tmp_path / "q.sql", tmp_path / "out.ndjson"
+    src.write_text("select 1; select boom;")
+    code, summary = _run(monkeypatch, capsys, "validate-batch", "--file", str(src), "--out", str(out))
+    assert code == 1 and summary["errors"] == 1
+    recs = {r["i"]: r for r in map(json.loads, out.read_text().splitlines())}
+    assert recs[0]["total_cost"] == 1.5 and "explain_json" not in recs[0]
+    assert recs[1]["ok"] is False and "boom" in recs[1]["error"]
@@ -0,0 +1,114 @@
+import pytest
+
+pymysql = pytest.importorskip("pymysql")
+from connectors import mysql
+
+class _SSCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = [("x",)]
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchmany(self, n):
+        out, self.rows = self.rows[:n], self.rows[n:]
+        return out
+
+    def close(self):
+        # pymysql drains the unbuffered result here
+        self.closed = True
+
+class _Conn:
+    def __init__(self, cur):
+        self.cur = cur
+        self.closed = False
+
+    def cursor(self, cls=None):
+        return self.cur
+
+    def thread_id(self):
+        return 7
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def cursor(monkeypatch):
+    cur = _SSCursor([(i,) for i in range(5)])
+    conn = _Conn(cur)
+    kills = []
+    c = mysql.MySQLConnector("mysql://u:p@h:3306/db")
+    monkeypatch.setattr(c, "_connect", lambda **kw: conn)
+    monkeypatch.setattr(c, "_killer", lambda conn: lambda: kills.append(conn.thread_id()))
+    return c.open_cursor("SELECT x FROM t"), cur, conn, kills
+
+def test_close_abandoned_stream_kills_instead_of_draining(cursor):
+    sc, cur, conn, kills = cursor
+    assert sc.fetch(2) == [[0], [1]]
+    sc.close()
+    assert kills == [7] and not cur.closed and conn.closed
+
+def test_close_exhausted_stream(cursor):
+    sc, cur, conn, kills = cursor
+    assert len(sc.fetch(10)) == 5
+    sc.close()
+    assert kills == [] and cur.closed and conn.closed
+
+class _MultiCursor:
+    """Multi-statement EXPLAIN batches: results in order, MySQL stopping at the first error."""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _advance(self):
+        stmt = self.results.pop(0)
+        if "bad" in stmt:
+            self.results = []
+            raise pymysql.err.MySQLError(f"syntax error near {stmt!r}")
+        self.current = [{"rows": int(stmt.rsplit(" ", 1)[1])}]
+
+    def execute(self, sql, params=None):
+        self.results = sql.split(";\n")
+        self.batches.append(len(self.results))
+        self._advance()
+
+    def nextset(self):
+        self._advance()
+
+    def fetchall(self):
+        return self.current
+
+class _MultiConn:
+    open = True
+
+    def __init__(self, batches):
+        self.batches = batches
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return _MultiCursor(self.batches)
+
+def test_validate_many_resubmits_after_failing_statement(monkeypatch):
+    batches = []
+    c = mysql.MySQLConnector("mysql://u:p@h:3306/db")
+    monkeypatch.setattr(c, "_connect", lambda **kw: _MultiConn(batches))
+    monkeypatch.setattr(c, "_killer", lambda conn: lambda: None)
+    out = c.validate_many(["SELECT 1", "SELECT bad", "DELETE FROM t", "SELECT 3", "SELECT bad2", "SELECT 5"])
+    assert [o.get("est_rows") for o in out] == [1, None, None, 3, None, 5]
+    assert "syntax error" in out[1]["error"] and "Only SELECT" in out[2]["error"] and "syntax error" in out[4]["error"]
+    # the gate-rejected statement is never sent; each failure costs one resubmission of the rest
+    assert batches == [5, 3, 1]
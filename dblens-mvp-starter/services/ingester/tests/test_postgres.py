@@ -0,0 +1,86 @@
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+from connectors import postgres_external
+
+def _plan(cost):
+    return [{"Plan": {"Total Cost": cost, "Plan Rows": 1}}]
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        stmt = sql.removeprefix("EXPLAIN (FORMAT JSON) ")
+        self.result = self.error = None
+        self.conn.sent.append((self.conn.piped, stmt))
+        if self.conn.piped and self.conn.aborted:
+            # everything after a failure in a pipeline is skipped by the server
+            self.error = psycopg.Error("pipeline aborted")
+        elif "bad" in stmt:
+            self.error = psycopg.Error(f"syntax error at {stmt!r}")
+            self.conn.aborted = self.conn.piped
+            if not self.conn.piped:
+                raise self.error
+        else:
+            self.result = (_plan(float(stmt.rsplit(" ", 1)[1])),)
+
+    def fetchone(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class _Pipeline:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.piped = True
+
+    def __exit__(self, *exc):
+        self.conn.piped = False
+        if self.conn.aborted and exc[0] is None:
+            raise psycopg.Error("pipeline aborted")
+        return False
+
+class _Conn:
+    broken = False
+
+    def __init__(self):
+        self.sent = []
+        self.piped = self.aborted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cancel(self):
+        pass
+
+    def pipeline(self):
+        return _Pipeline(self)
+
+    def cursor(self):
+        return _Cursor(self)
+
+def test_validate_many_replans_after_pipeline_abort(monkeypatch):
+    conn = _Conn()
+    c = postgres_external.PostgresExternal("postgresql://fake")
+    monkeypatch.setattr(c, "_connect", lambda **kw: conn)
+    monkeypatch.setattr(psycopg.Pipeline, "is_supported", classmethod(lambda cls: True))
+    out = c.validate_many(["SELECT 1", "SELECT bad", "SELECT 3", "UPDATE t SET x=1", "SELECT 4"])
+    assert [o.get("total_cost") for o in out] == [1.0, None, 3.0, None, 4.0]
+    assert "syntax error" in out[1]["error"] and "Only SELECT" in out[3]["error"]
+    # one pipelined pass; then only the failed and aborted statements are planned again, one by one
+    assert [s for piped, s in conn.sent if piped] == ["SELECT 1", "SELECT bad", "SELECT 3", "SELECT 4"]
+    assert [s for piped, s in conn.sent if not piped] == ["SELECT bad", "SELECT 3", "SELECT 4"]
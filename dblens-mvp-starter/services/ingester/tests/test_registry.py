@@ -0,0 +1,47 @@
+import importlib.metadata
+
+import pytest
+
+from connectors import registry
+
+class _EP:
+    group = registry.ENTRY_POINT_GROUP
+
+    def __init__(self, name, cls):
+        self.name = name
+        self._cls = cls
+
+    def load(self):
+        return self._cls
+
+class _Fake:
+    def __init__(self, dsn):
+        self.dsn = dsn
+
+class _Other(_Fake):
+    pass
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(registry, "_targets", dict(registry.BUILTIN))
+    monkeypatch.setattr(registry, "_loaded", {})
+    monkeypatch.setattr(registry, "_scanned", False)
+    monkeypatch.delenv("CONNECTOR_PLUGINS", raising=False)
+
+def _entry_points(*eps):
+    return lambda group=None: [ep for ep in eps if ep.group == group]
+
+def test_entry_point_overrides_builtin(fresh, monkeypatch):
+    monkeypatch.setattr(importlib.metadata, "entry_points", _entry_points(_EP("mysql", _Fake)))
+    assert registry.get("mysql") is _Fake
+    assert registry.build("mysql", "dsn").dsn == "dsn"
+
+def test_env_plugin_overrides_entry_point(fresh, monkeypatch):
+    monkeypatch.setattr(importlib.metadata, "entry_points", _entry_points(_EP("ch", _Fake)))
+    monkeypatch.setenv("CONNECTOR_PLUGINS", f"ch={__name__}:_Other")
+    assert registry.get("ch") is _Other
+
+def test_unknown_driver(fresh, monkeypatch):
+    monkeypatch.setattr(importlib.metadata, "entry_points", _entry_points())
+    with pytest.raises(registry.UnknownDriver):
+        registry.get("nope")
@@ -0,0 +1,40 @@
+import datetime, decimal, uuid
+
+import pytest
+
+import results
+import serialize
+
+def test_document_columns():
+    assert not results._is_document_column([1, 2, None])
+    assert not results._is_document_column(["a", None, "b"])
+    assert results._is_document_column([{"a": 1}, None])
+    assert results._is_document_column([[1, 2], [3]])
+    assert results._is_document_column([1, "x"])
+
+def test_round_trip_keeps_documents_and_mixed_values(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(results, "RESULTS_DIR", str(tmp_path))
+    cols = ["id", "doc", "mixed", "tags", "uid", "amount", "day"]
+    rows = [
+        (1, {"a": 1}, 1, ["x"], uuid.UUID(int=1), decimal.Decimal("1.50"), datetime.date(2024, 1, 2)),
+        (2, {"b": "two"}, "1", [], uuid.UUID(int=2), None, None),
+        (3, None, None, None, None, decimal.Decimal("3"), datetime.date(2024, 1, 3)),
+    ]
+    digest = results.spill(cols, rows)
+    table, total = results.read_slice(digest)
+    assert total == 3
+    out = results.to_payload(table, "columns")["data"]
+    assert out[0] == [1, 2, 3]
+    # no struct inference: missing keys are not filled in with nulls
+    assert out[1] == [{"a": 1}, {"b": "two"}, None]
+    # mixed types keep their JSON type instead of all becoming text
+    assert out[2] == [1, "1", None]
+    assert out[3] == [["x"], [], None]
+    # scalar columns may come back as native Arrow types; on the wire they match the originals
+    assert serialize.dumps(out[4:]) == serialize.dumps([list(c) for c in zip(*rows)][4:])
+
+def test_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(results, "RESULTS_DIR", str(tmp_path))
+    with pytest.raises(results.Evicted):
+        results.ensure_stored("ab" * 32)
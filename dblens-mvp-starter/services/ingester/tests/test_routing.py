@@ -0,0 +1,107 @@
+import itertools
+
+import pytest
+
+from connectors import registry, routing
+from connectors.connector_base import ServerCursor
+
+# per-DSN behaviour of the fake backend: {"down": bool, "lag": seconds or None}
+STATE = {}
+
+class _Session:
+    def close(self):
+        pass
+
+class FakeDriver:
+    def __init__(self, dsn):
+        self.dsn = dsn
+
+    def _connect(self):
+        if STATE.get(self.dsn, {}).get("down"):
+            raise OSError(f"{self.dsn} refused")
+        return _Session()
+
+    def replication_lag_s(self, conn):
+        return STATE.get(self.dsn, {}).get("lag")
+
+    def run(self, fail=False):
+        self._connect()
+        if fail:
+            raise ValueError("bad query")
+        return self.dsn
+
+    def open_cursor(self, sql_text, limit=None, idle_timeout_s=300):
+        self._connect()
+        return ServerCursor(["x"], lambda n: [], lambda: None, ref=self.dsn)
+
+_ids = itertools.count()
+
+@pytest.fixture
+def router(monkeypatch):
+    STATE.clear()
+    monkeypatch.setattr(registry, "_targets", dict(registry.BUILTIN, fake=FakeDriver))
+    monkeypatch.setattr(registry, "_loaded", {})
+    monkeypatch.setattr(registry, "_scanned", True)
+    monkeypatch.setattr(routing, "_stats", {})
+    def make(max_lag_s=None):
+        return routing.RoutedConnector("fake", ["p", "r1"], conn_id=f"t{next(_ids)}", max_lag_s=max_lag_s)
+    return make
+
+def test_unmeasured_tie_goes_to_primary_then_score_decides(router):
+    rc = router()
+    assert rc.run() == "p"
+    primary, replica = rc.endpoints
+    primary.stats.ewma_ms, replica.stats.ewma_ms = 50.0, 10.0
+    assert [e.name for e in rc.order()] == ["replica1", "primary"]
+    # calls in flight count against an endpoint: 10 * (1 + 9) > 50
+    replica.stats.inflight = 9
+    assert [e.name for e in rc.order()] == ["primary", "replica1"]
+
+def test_connect_error_fails_over_and_marks_endpoint_down(router):
+    rc = router()
+    STATE["p"] = {"down": True}
+    assert rc.run() == "r1"
+    assert not rc.endpoints[0].available()
+    assert [e.name for e in rc.order()] == ["replica1"]
+    assert all(e.stats.inflight == 0 for e in rc.endpoints)
+
+def test_all_down_raises_the_connect_error(router):
+    rc = router()
+    STATE["p"] = STATE["r1"] = {"down": True}
+    with pytest.raises(OSError):
+        rc.run()
+
+def test_query_errors_do_not_fail_over(router):
+    rc = router()
+    with pytest.raises(ValueError):
+        rc.run(fail=True)
+    assert rc.endpoints[0].available()
+    assert rc.endpoints[0].stats.inflight == 0
+
+def test_lagging_replica_is_skipped(router):
+    rc = router(max_lag_s=5)
+    STATE["r1"] = {"lag": 12.0}
+    primary, replica = rc.endpoints
+    primary.stats.ewma_ms, replica.stats.ewma_ms = 50.0, 10.0
+    assert rc.run() == "p"
+    assert replica.stats.lag_s == 12.0 and not replica.available()
+    # not down for connect errors, just stale-until-rechecked
+    assert replica.stats.down_until == 0.0
+
+def test_without_max_lag_replicas_are_not_checked(router):
+    rc = router()
+    STATE["r1"] = {"lag": 1e6}
+    rc.endpoints[0].stats.ewma_ms, rc.endpoints[1].stats.ewma_ms = 50.0, 10.0
+    assert rc.run() == "r1"
+
+def test_open_cursor_holds_the_endpoint_until_closed(router):
+    rc = router()
+    cur = rc.open_cursor("SELECT 1")
+    assert rc.endpoints[0].stats.inflight == 1
+    cur.close()
+    cur.close()
+    assert rc.endpoints[0].stats.inflight == 0
+
+def test_optional_methods_forwarded_only_when_the_driver_has_them(router):
+    rc = router()
+    assert hasattr(rc, "open_cursor") and not hasattr(rc, "validate_many")
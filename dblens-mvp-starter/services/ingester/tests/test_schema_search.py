@@ -0,0 +1,100 @@
+import schema_search
+from schema_search import SchemaIndex, SearchIndexes, tokenize
+
+def test_tokenize_splits_camel_and_underscores_and_singularizes():
+    assert tokenize("customerOrders") == ["customer", "order"]
+    assert tokenize("order_line_items") == ["order", "line", "item"]
+    assert tokenize("categories") == ["category"]
+    assert tokenize("address") == ["address"]
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("how many orders per customer") == ["order", "customer"]
+
+def _index():
+    idx = SchemaIndex()
+    idx.upsert("public.customers", [{"name": "id"}, {"name": "email"}])
+    idx.upsert("public.orders", [{"name": "id"}, {"name": "customer_id"}, {"name": "total"}])
+    idx.upsert("public.products", [{"name": "id"}, {"name": "sku"}])
+    return idx
+
+def test_expand_exact_match_only():
+    assert _index()._expand("customer") == [("customer", 1.0)]
+
+def test_expand_prefix_and_typo():
+    idx = _index()
+    assert [t for t, _ in idx._expand("cust")] == ["customer"]
+    assert idx._expand("cust")[0][1] >= 0.8
+    assert [t for t, _ in idx._expand("custmer")] == ["customer"]
+    assert idx._expand("zzzz") == []
+
+def test_fk_boost_lifts_neighbour_by_naming():
+    idx = _index()
+    hits = {h["table"]: h for h in idx.search("email")}
+    # only customers matches, but orders.customer_id links orders to it
+    assert set(hits) == {"public.customers", "public.orders"}
+    assert hits["public.orders"]["score"] == round(schema_search.FK_BOOST * hits["public.customers"]["score"], 4)
+    assert hits["public.orders"]["matched_tokens"] == []
+    assert hits["public.customers"]["related"] == ["public.orders"]
+
+def test_fk_boost_uses_declared_foreign_keys():
+    idx = SchemaIndex()
+    idx.upsert("s.invoices", [{"name": "buyer"}], fks=[{"ref_table": "s.accounts"}])
+    idx.upsert("s.accounts", [{"name": "holder"}])
+    assert [h["table"] for h in idx.search("holder")] == ["s.accounts", "s.invoices"]
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        if "count" in sql:
+            raise AssertionError("sync should not rely on counts")
+        if "columns_json" in sql:
+            wanted = set(params[1])
+            self.result = [(f, cols, {}, ts) for f, (ts, cols) in self.rows.items() if f in wanted]
+        else:
+            self.result = [(f, ts) for f, (ts, _) in self.rows.items()]
+
+    def fetchall(self):
+        return self.result
+
+class _Conn:
+    def __init__(self):
+        self.rows = {}
+
+    def cursor(self):
+        return _Cursor(self.rows)
+
+def test_sync_picks_up_late_refresh_and_equal_count_delete():
+    indexes, cp = SearchIndexes(), _Conn()
+    cp.rows["s.a"] = (10, [{"name": "alpha"}])
+    cp.rows["s.b"] = (20, [{"name": "beta"}])
+    idx = indexes.sync(1, cp)
+    assert [h["table"] for h in idx.search("beta")] == ["s.b"]
+    # a refresh that commits after a newer one was already synced
+    cp.rows["s.a"] = (15, [{"name": "gamma"}])
+    # and a delete offset by an insert, so the row count is unchanged
+    del cp.rows["s.b"]
+    cp.rows["s.c"] = (21, [{"name": "delta"}])
+    idx = indexes.sync(1, cp)
+    assert [h["table"] for h in idx.search("gamma")] == ["s.a"]
+    assert idx.search("beta") == []
+    assert sorted(idx.docs) == ["s.a", "s.c"]
+
+def test_sync_after_upsert_card_is_a_hit():
+    indexes, cp = SearchIndexes(), _Conn()
+    cp.rows["s.a"] = (10, [{"name": "alpha"}])
+    card = {"tables": [{"schema": "s", "name": "a", "columns": [{"name": "alpha"}],
+                        "foreign_keys": [{"ref_table": "s.b"}]}]}
+    indexes.upsert_card(1, card, {"s.a": 10})
+    before = indexes.get(1).docs["s.a"]
+    idx = indexes.sync(1, cp)
+    # nothing re-read: the doc built from the card (with its FKs) is still the one indexed
+    assert idx.docs["s.a"] is before and before.fks == ["s.b"]
@@ -0,0 +1,17 @@
+import base64, datetime, decimal, json, uuid
+
+import serialize
+
+def test_bytes_are_always_base64():
+    for raw in (b"plain text", b"\xff\xfe\x00", bytearray(b"ab"), memoryview(b"cd")):
+        out = json.loads(serialize.dumps([raw]))
+        assert base64.b64decode(out[0]) == bytes(raw)
+
+def test_type_mapping():
+    row = (datetime.date(2024, 1, 2), decimal.Decimal("1.5"), uuid.UUID(int=1), datetime.timedelta(seconds=90), (1, 2))
+    assert json.loads(serialize.dumps(row)) == ["2024-01-02", 1.5, str(uuid.UUID(int=1)), 90.0, [1, 2]]
+
+def test_result_payload_layouts():
+    rows = [(1, "a"), (2, "b")]
+    assert serialize.result_payload(["n", "s"], rows) == {"columns": ["n", "s"], "rows": rows}
+    assert serialize.result_payload(["n", "s"], rows, "columns")["data"] == [[1, 2], ["a", "b"]]